@@ -0,0 +1,57 @@
+import argparse
+import json
+import sys
+
+# Метрики, рост которых считается регрессией.
+METRICS = ('p50', 'p90', 'p99', 'queries', 'peak_memory_kib')
+
+
+def compare(base, current, threshold):
+    """Строки сравнения двух прогонов и список регрессий.
+
+    Время и память сравниваются с допуском threshold процентов,
+    число запросов — строго.
+    """
+    rows, regressions = [], []
+    for view, modes in current['views'].items():
+        for mode, result in modes.items():
+            old = base['views'].get(view, {}).get(mode)
+            if old is None:
+                continue
+            for metric in METRICS:
+                before, after = old[metric], result[metric]
+                change = (after - before) / before * 100 if before else 0.0
+                rows.append((view, mode, metric, before, after, change))
+                allowed = 0 if metric == 'queries' else threshold
+                if after > before and (change > allowed or not before):
+                    regressions.append(rows[-1])
+    return rows, regressions
+
+
+def print_rows(rows, stdout=sys.stdout):
+    for view, mode, metric, before, after, change in rows:
+        stdout.write(f'{view:<14} {mode:<5} {metric:<16} '
+                     f'{before:>10.2f} {after:>10.2f} {change:>+8.1f}%\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Сравнивает два JSON-отчёта бенчмарка.')
+    parser.add_argument('base')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='допустимый рост времени и памяти, %%')
+    args = parser.parse_args(argv)
+    with open(args.base) as base, open(args.current) as current:
+        rows, regressions = compare(json.load(base), json.load(current),
+                                    args.threshold)
+    print_rows(rows)
+    if regressions:
+        print(f'\nРегрессии: {len(regressions)}')
+        print_rows(regressions)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
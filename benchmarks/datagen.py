@@ -0,0 +1,93 @@
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from faker import Faker
+
+from posts import counters, feed, search
+from posts.models import Comment, Follow, Group, Post, User
+from posts.transfer import batches, explicit_dates
+
+TEXT_POOL = 1000
+
+
+def _insert(model, objects, batch_size):
+    for batch in batches(objects, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _skewed(rnd, ids, power=3):
+    """Случайный элемент со смещением к началу списка: немногие авторы
+    пишут и собирают подписчиков больше остальных."""
+    return ids[int(len(ids) * rnd.random() ** power)]
+
+
+def generate(posts, users=None, groups=50, follows=20, comments=2,
+             days=365, batch_size=5000, seed=0, log=print):
+    """Заполняет пустую базу синтетическими данными.
+
+    Вставка идёт через bulk_create, поэтому сигналы не срабатывают:
+    счётчики, ленты подписок и поисковый индекс строятся в конце.
+    """
+    users = users or max(posts // 10, 10)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    rnd = random.Random(seed)
+    now = timezone.now()
+    span = days * 24 * 60 * 60
+    texts = [fake.paragraph(nb_sentences=3) for _ in range(TEXT_POOL)]
+    names = [(fake.first_name(), fake.last_name()) for _ in range(TEXT_POOL)]
+
+    log(f'Пользователи: {users}')
+    _insert(User, (
+        User(username=f'user{i}', first_name=first, last_name=last,
+             password='!')
+        for i, (first, last) in enumerate(
+            rnd.choice(names) for _ in range(users))
+    ), batch_size)
+    user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+
+    log(f'Группы: {groups}')
+    _insert(Group, (
+        Group(title=f'Группа {i}', slug=f'group-{i}',
+              description=rnd.choice(texts))
+        for i in range(groups)
+    ), batch_size)
+    group_ids = list(Group.objects.values_list('pk', flat=True))
+
+    log(f'Посты: {posts}')
+    with explicit_dates(Post._meta.get_field('pub_date')):
+        _insert(Post, (
+            Post(text=rnd.choice(texts), author_id=_skewed(rnd, user_ids),
+                 group_id=(rnd.choice(group_ids)
+                           if rnd.random() < 0.7 else None),
+                 pub_date=now - timedelta(seconds=rnd.uniform(0, span)))
+            for _ in range(posts)
+        ), batch_size)
+
+    log(f'Подписки: до {follows} на пользователя')
+    _insert(Follow, (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id in user_ids
+        for author_id in {_skewed(rnd, user_ids) for _ in range(follows)}
+        if author_id != user_id
+    ), batch_size)
+
+    bounds = Post.objects.aggregate(first=Min('pk'), last=Max('pk'))
+    log(f'Комментарии: {posts * comments}')
+    with explicit_dates(Comment._meta.get_field('created')):
+        _insert(Comment, (
+            Comment(post_id=rnd.randint(bounds['first'], bounds['last']),
+                    author_id=rnd.choice(user_ids),
+                    text=rnd.choice(texts),
+                    created=now - timedelta(seconds=rnd.uniform(0, span)))
+            for _ in range(posts * comments)
+        ), batch_size)
+
+    log('Счётчики, ленты подписок и поисковый индекс')
+    counters.recount(batch_size=batch_size)
+    feed.rebuild()
+    search.rebuild(batch_size=batch_size)
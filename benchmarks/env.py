@@ -0,0 +1,46 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.join(ROOT, 'yatube')
+
+
+def setup_settings():
+    """Делает настройки проекта доступными без подключения к базе."""
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+
+def setup(database, fresh=False):
+    """Поднимает Django на отдельной базе бенчмарка и применяет миграции.
+
+    База проекта не трогается: путь к файлу подменяется до django.setup().
+    """
+    database = os.path.abspath(database)
+    if fresh and os.path.exists(database):
+        os.remove(database)
+    # Шаблоны в режиме без DEBUG: кэширующий загрузчик и разбор при запуске.
+    os.environ['YATUBE_DEBUG'] = '0'
+    setup_settings()
+
+    import django
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = database
+    # Свой каталог файлового кэша: cache.clear() в холодных замерах
+    # не должен трогать кэш сервера, запущенного из того же клона.
+    cache_dir = tempfile.mkdtemp(prefix='yatube-bench-cache-')
+    atexit.register(shutil.rmtree, cache_dir, ignore_errors=True)
+    settings.CACHES['default']['LOCATION'] = cache_dir
+    settings.POSTS_THUMBNAIL_WORKERS = 0
+    # Бенчмарки не запускают collectstatic: манифеста статики нет.
+    settings.STATICFILES_STORAGE = (
+        'django.contrib.staticfiles.storage.StaticFilesStorage')
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
@@ -0,0 +1,204 @@
+"""Бенчмарк представлений posts на синтетических данных.
+
+Пример:
+    python -m benchmarks.run --scale medium --output results/head.json
+    python -m benchmarks.run --compare results/base.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from . import env
+from .compare import compare, print_rows
+
+DEFAULT_DATABASE = os.path.join(env.ROOT, 'benchmarks', 'bench.sqlite3')
+RESULTS_DIR = os.path.join(env.ROOT, 'benchmarks', 'results')
+# Число постов для готовых масштабов; остальное считается от него.
+SCALES = {
+    'small': 10_000,
+    'medium': 100_000,
+    'large': 1_000_000,
+    'huge': 10_000_000,
+}
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, round(percent / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def scenarios():
+    """URL представлений на самых тяжёлых для них объектах."""
+    from django.urls import reverse
+    from posts.models import AuthorStats, Group, Post
+
+    heavy_author = AuthorStats.objects.order_by('-posts_count').first()
+    reader = AuthorStats.objects.order_by('-following_count').first()
+    group = Group.objects.order_by('-posts_count').first()
+    post = Post.objects.order_by('-comments_count').first()
+    deep_page = max(1, Post.objects.count() // 10 // 2)
+    word = post.text.split()[0]
+    return {
+        'index': (reverse('posts:index'), None),
+        'index_deep': (f"{reverse('posts:index')}?page={deep_page}", None),
+        'group_posts': (reverse('posts:group_posts', args=[group.slug]),
+                        None),
+        'profile': (reverse('posts:profile',
+                            args=[heavy_author.user.username]), None),
+        'post_detail': (reverse('posts:post_detail', args=[post.pk]), None),
+        'follow_index': (reverse('posts:follow_index'), reader.user),
+        'search': (f"{reverse('posts:search')}?q={word}", None),
+    }
+
+
+def measure(client, url, repeat, warm):
+    """Время, число запросов и пик памяти одного представления.
+
+    В холодном режиме кэш ответов сбрасывается перед каждым запросом,
+    в тёплом страница один раз прогревается. Память снимается отдельным
+    запросом: tracemalloc заметно замедляет остальные.
+    """
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    def request():
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url}: ответ {response.status_code}')
+
+    def prepare():
+        # Сброс кэша не входит в замер: обход его каталога дорог.
+        if not warm:
+            cache.clear()
+
+    if warm:
+        request()
+    timings, queries = [], []
+    for _ in range(repeat):
+        prepare()
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            request()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(context.captured_queries))
+    prepare()
+    tracemalloc.start()
+    request()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'p50': percentile(timings, 50),
+        'p90': percentile(timings, 90),
+        'p99': percentile(timings, 99),
+        'mean': sum(timings) / len(timings),
+        'queries': max(queries),
+        'peak_memory_kib': peak / 1024,
+    }
+
+
+def dataset():
+    from posts.models import Comment, FeedEntry, Follow, Group, Post, User
+    return {
+        model.__name__: model.objects.count()
+        for model in (User, Group, Post, Follow, Comment, FeedEntry)
+    }
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=env.ROOT,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            universal_newlines=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--posts', type=int,
+                        help='число постов вместо готового масштаба')
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--follows', type=int, default=20,
+                        help='подписок на пользователя')
+    parser.add_argument('--comments', type=int, default=2,
+                        help='комментариев на пост')
+    parser.add_argument('--regenerate', action='store_true',
+                        help='пересоздать базу, даже если она заполнена')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--views', nargs='*',
+                        help='только перечисленные сценарии')
+    parser.add_argument('--output')
+    parser.add_argument('--compare', help='отчёт, с которым сравнить')
+    parser.add_argument('--threshold', type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    env.setup(args.database, fresh=args.regenerate)
+
+    from django.test import Client
+    from posts.models import Post
+
+    from .datagen import generate
+
+    if not Post.objects.exists():
+        generate(args.posts or SCALES[args.scale], users=args.users,
+                 follows=args.follows, comments=args.comments)
+
+    results = {}
+    for name, (url, user) in scenarios().items():
+        if args.views and name not in args.views:
+            continue
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        results[name] = {
+            mode: measure(client, url, args.repeat, warm=mode == 'warm')
+            for mode in ('cold', 'warm')
+        }
+        cold = results[name]['cold']
+        print(f"{name:<14} p50 {cold['p50']:8.2f} мс  "
+              f"p99 {cold['p99']:8.2f} мс  запросов {cold['queries']:3}  "
+              f"память {cold['peak_memory_kib']:9.1f} КиБ")
+
+    report = {
+        'meta': {
+            'commit': commit(),
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'repeat': args.repeat,
+            'dataset': dataset(),
+        },
+        'views': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{report['meta']['commit'] or 'current'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(f'Отчёт: {output}')
+
+    if args.compare:
+        with open(args.compare) as file:
+            rows, regressions = compare(json.load(file), report,
+                                        args.threshold)
+        print_rows(rows)
+        if regressions:
+            print(f'\nРегрессии: {len(regressions)}')
+            print_rows(regressions)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""Пропускная способность SQLite при параллельных читателях и писателе.
+
+Сравнивает стандартную настройку Django (журнал отката, новое
+соединение на каждый запрос) с WAL, прагмами SQLITE_PRAGMAS и
+постоянными соединениями.
+
+Пример:
+    python -m benchmarks.sqlite_concurrency --readers 8 --seconds 5
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from . import env
+
+FEED_QUERY = (
+    'SELECT id, author_id, text, pub_date FROM post '
+    'ORDER BY pub_date DESC, id DESC LIMIT 10 OFFSET ?'
+)
+AUTHOR_QUERY = (
+    'SELECT id, text, pub_date FROM post WHERE author_id = ? '
+    'ORDER BY pub_date DESC, id DESC LIMIT 10'
+)
+
+
+def pragmas():
+    env.setup_settings()
+    from django.conf import settings
+    return settings.SQLITE_PRAGMAS
+
+
+def create(path, posts, authors):
+    with sqlite3.connect(path) as db:
+        db.execute('CREATE TABLE post (id INTEGER PRIMARY KEY, '
+                   'author_id INTEGER, text TEXT, pub_date REAL)')
+        db.execute('CREATE INDEX post_pub_date ON post (pub_date, id)')
+        db.execute('CREATE INDEX post_author ON post '
+                   '(author_id, pub_date, id)')
+        db.executemany(
+            'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)',
+            ((random.randrange(authors), 'Текст поста ' * 20, time.time() - i)
+             for i in range(posts)),
+        )
+    db.close()
+
+
+def connect(path, tuned, settings_pragmas):
+    # 5 секунд — таймаут, с которым Django открывает SQLite по умолчанию.
+    db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    if tuned:
+        for name, value in settings_pragmas.items():
+            db.execute(f'PRAGMA {name} = {value}')
+    else:
+        db.execute('PRAGMA journal_mode = DELETE')
+    return db
+
+
+class Load:
+    """Счётчики и сессии потоков одного прогона."""
+
+    def __init__(self, path, tuned, seconds, authors, settings_pragmas):
+        self.path = path
+        self.tuned = tuned
+        self.authors = authors
+        self.settings_pragmas = settings_pragmas
+        self.stop = time.perf_counter() + seconds
+        self.counts = {'reads': 0, 'writes': 0, 'errors': 0}
+        self.lock = threading.Lock()
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def connect(self):
+        return connect(self.path, self.tuned, self.settings_pragmas)
+
+    def session(self, work):
+        # Стандартная настройка: соединение на каждый запрос (CONN_MAX_AGE
+        # не задан); настроенная: одно постоянное на поток.
+        db = self.connect() if self.tuned else None
+        rnd = random.Random()
+        while time.perf_counter() < self.stop:
+            current = db or self.connect()
+            try:
+                work(current, rnd)
+            except sqlite3.OperationalError:
+                self.count('errors')
+            finally:
+                if db is None:
+                    current.close()
+        if db is not None:
+            db.close()
+
+    def read(self, db, rnd):
+        db.execute(FEED_QUERY, (rnd.randrange(100) * 10,)).fetchall()
+        db.execute(AUTHOR_QUERY, (rnd.randrange(self.authors),)).fetchall()
+        self.count('reads')
+
+    def write(self, db, rnd):
+        with db:
+            db.execute(
+                'INSERT INTO post (author_id, text, pub_date) '
+                'VALUES (?, ?, ?)',
+                (rnd.randrange(self.authors), 'Новый пост', time.time()),
+            )
+        self.count('writes')
+
+
+def run(path, tuned, readers, seconds, authors, settings_pragmas):
+    """Читатели выполняют запросы лент, писатель добавляет посты."""
+    load = Load(path, tuned, seconds, authors, settings_pragmas)
+    threads = [threading.Thread(target=load.session, args=(load.read,))
+               for _ in range(readers)]
+    threads.append(threading.Thread(target=load.session, args=(load.write,)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {key: value / seconds if key != 'errors' else value
+            for key, value in load.counts.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=100_000)
+    parser.add_argument('--authors', type=int, default=1000)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--output')
+    args = parser.parse_args(argv)
+
+    settings_pragmas = pragmas()
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ('stock', 'tuned'):
+            path = os.path.join(directory, f'{mode}.sqlite3')
+            create(path, args.posts, args.authors)
+            results[mode] = run(path, mode == 'tuned', args.readers,
+                                args.seconds, args.authors, settings_pragmas)
+            print(f"{mode:<6} чтений/с {results[mode]['reads']:10.1f}  "
+                  f"записей/с {results[mode]['writes']:8.1f}  "
+                  f"ошибок блокировки {results[mode]['errors']}")
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'pragmas': settings_pragmas, 'readers': args.readers,
+                       'results': results}, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
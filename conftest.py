@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def temporary_cache():
+    """Файловый кэш тестов во временном каталоге (core/test_runner.py)."""
+    from core.test_runner import temporary_cache
+    with temporary_cache() as directory:
+        yield directory
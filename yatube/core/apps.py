@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.template import engines
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import sqlite  # noqa: F401
+        from .template_backend import InstrumentedDjangoTemplates
+
+        if settings.TEMPLATES_PRECOMPILE:
+            for engine in engines.all():
+                if isinstance(engine, InstrumentedDjangoTemplates):
+                    engine.precompile()
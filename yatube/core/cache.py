@@ -0,0 +1,165 @@
+"""Двухуровневый кэш: LRU в памяти процесса перед общим файловым кэшем.
+
+Файловый уровень общий для всех процессов сервера и переживает
+перезапуск. Уровень в памяти избавляет от чтения файла при повторных
+обращениях, но может отставать от соседних процессов на L1_TIMEOUT
+секунд, поэтому ключи с префиксами L1_EXCLUDE_PREFIXES (версии областей
+кэша ответов) читаются только из общего уровня.
+"""
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class SharedFileCache(FileBasedCache):
+    """FileBasedCache с атомарным add() и редкой проверкой размера."""
+
+    # Подсчёт файлов каталога на каждой записи обходится дорого.
+    cull_every = 100
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._writes = 0
+
+    def _cull(self):
+        self._writes += 1
+        if self._writes % self.cull_every == 1:
+            super()._cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._createdir()
+        fname = self._key_to_file(key, version)
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, 'wb') as f:
+                self._write_content(f, timeout, value)
+            for _ in range(2):
+                try:
+                    # link() не перезаписывает существующий файл: из
+                    # нескольких процессов ключ добавит только один.
+                    os.link(tmp_path, fname)
+                    return True
+                except FileExistsError:
+                    if self.has_key(key, version):
+                        return False
+            return False
+        finally:
+            os.remove(tmp_path)
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = dict(params.get('OPTIONS', {}))
+        self.l1_max_entries = options.pop('L1_MAX_ENTRIES', 1000)
+        self.l1_timeout = options.pop('L1_TIMEOUT', 5)
+        self.l1_exclude = tuple(options.pop('L1_EXCLUDE_PREFIXES', ()))
+        self.shared = SharedFileCache(location, {**params, 'OPTIONS': options})
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Уровень в памяти хранит сериализованные значения: объекты ответов
+    # не должны делиться между запросами, которые их дополняют.
+
+    def _l1_key(self, key, version):
+        if key.startswith(self.l1_exclude):
+            return None
+        return self.make_key(key, version)
+
+    def _l1_get(self, l1_key):
+        with self._lock:
+            entry = self._local.get(l1_key)
+            if entry is None:
+                return None
+            expires, data = entry
+            if expires < time.monotonic():
+                del self._local[l1_key]
+                return None
+            self._local.move_to_end(l1_key)
+        return pickle.loads(data)
+
+    def _l1_set(self, l1_key, value, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None or timeout > self.l1_timeout:
+            timeout = self.l1_timeout
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[l1_key] = (time.monotonic() + timeout, data)
+            self._local.move_to_end(l1_key)
+            while len(self._local) > self.l1_max_entries:
+                self._local.popitem(last=False)
+
+    def _l1_delete(self, l1_key):
+        with self._lock:
+            self._local.pop(l1_key, None)
+
+    def get(self, key, default=None, version=None):
+        l1_key = self._l1_key(key, version)
+        if l1_key is not None:
+            value = self._l1_get(l1_key)
+            if value is not None:
+                return value
+        value = self.shared.get(key, version=version)
+        if value is None:
+            return default
+        if l1_key is not None:
+            self._l1_set(l1_key, value, self.l1_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        found, missing = {}, []
+        for key in keys:
+            l1_key = self._l1_key(key, version)
+            value = None if l1_key is None else self._l1_get(l1_key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        for key, value in self.shared.get_many(missing,
+                                               version=version).items():
+            l1_key = self._l1_key(key, version)
+            if l1_key is not None:
+                self._l1_set(l1_key, value, self.l1_timeout)
+            found[key] = value
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        l1_key = self._l1_key(key, version)
+        if l1_key is not None:
+            self._l1_set(l1_key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.shared.add(key, value, timeout, version=version):
+            return False
+        l1_key = self._l1_key(key, version)
+        if l1_key is not None:
+            self._l1_set(l1_key, value, timeout)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        l1_key = self._l1_key(key, version)
+        if l1_key is not None:
+            self._l1_delete(l1_key)
+        self.shared.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, version=version) is not None
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
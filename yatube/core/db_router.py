@@ -0,0 +1,55 @@
+import random
+import threading
+
+from django.conf import settings
+
+_local = threading.local()
+
+# Таблицы, которые читаются сразу после записи в том же запросе.
+PRIMARY_APPS = {'sessions'}
+
+
+def use_replica(alias):
+    _local.replica = alias
+
+
+def reset():
+    _local.replica = None
+    _local.wrote = False
+
+
+def wrote():
+    """Писал ли текущий запрос в базу (через db_for_write)."""
+    return getattr(_local, 'wrote', False)
+
+
+def current_replica():
+    """Реплика, с которой читает текущий запрос, или None."""
+    return getattr(_local, 'replica', None)
+
+
+def choose_replica():
+    replicas = settings.DATABASE_REPLICAS
+    return random.choice(replicas) if replicas else None
+
+
+class ReplicaRouter:
+    """Чтения из представлений, отмеченных ReplicaMiddleware, уходят
+    на реплику; все записи и остальные чтения — в default."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return 'default'
+        return current_replica() or 'default'
+
+    def db_for_write(self, model, **hints):
+        # Запись бывает и в GET-представлениях (подписка по ссылке):
+        # ReplicaMiddleware по этой отметке закрепляет чтения за default.
+        _local.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
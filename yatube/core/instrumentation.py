@@ -0,0 +1,170 @@
+"""Метрики запросов в памяти процесса.
+
+Каждый процесс сервера копит свои гистограммы; Prometheus опрашивает
+процессы по отдельности или через агрегирующий прокси.
+"""
+import random
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+_local = threading.local()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Гистограммы и счётчики с метками, потокобезопасно."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+
+    def observe(self, name, help_text, buckets, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help[name] = ('histogram', help_text)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name, help_text, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help[name] = ('counter', help_text)
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._help.clear()
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        with self._lock:
+            histograms = sorted(
+                (key, histogram.buckets, list(histogram.counts),
+                 histogram.sum, histogram.count)
+                for key, histogram in self._histograms.items()
+            )
+            counters = sorted(self._counters.items())
+            help_texts = dict(self._help)
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described:
+                described.add(name)
+                kind, help_text = help_texts[name]
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), buckets, counts, total, count in histograms:
+            describe(name)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket'
+                             f'{_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {total}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f'{name}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join(f'{key}="{_escape(value)}"'
+                             for key, value in pairs)
+
+
+registry = Registry()
+
+
+class RequestStats:
+    """Замеры одного запроса: время SQL и рендеринга шаблонов."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0
+        self.template_time = 0
+        self.templates = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def add_template(self, name, duration):
+        self.templates[name] = self.templates.get(name, 0) + duration
+
+
+def sampled():
+    return random.random() < settings.INSTRUMENTATION_SAMPLE_RATE
+
+
+def current():
+    """Замеры текущего запроса или None, если он не попал в выборку."""
+    return getattr(_local, 'stats', None)
+
+
+def activate(stats):
+    _local.stats = stats
+
+
+def deactivate():
+    _local.stats = None
+
+
+def record(view, duration, stats, cache_status):
+    registry.observe('yatube_request_duration_seconds',
+                     'Время обработки запроса.', SECONDS_BUCKETS,
+                     duration, view=view)
+    registry.observe('yatube_db_queries', 'SQL-запросов на запрос.',
+                     QUERIES_BUCKETS, stats.queries, view=view)
+    registry.observe('yatube_db_duration_seconds',
+                     'Суммарное время SQL-запросов.', SECONDS_BUCKETS,
+                     stats.db_time, view=view)
+    registry.observe('yatube_template_duration_seconds',
+                     'Время рендеринга шаблонов.', SECONDS_BUCKETS,
+                     stats.template_time, view=view)
+    for template, template_time in stats.templates.items():
+        registry.observe('yatube_template_render_seconds',
+                         'Время рендеринга шаблона с вложенными.',
+                         SECONDS_BUCKETS, template_time, template=template)
+    if cache_status:
+        registry.increment('yatube_response_cache_total',
+                           'Обращения к кэшу ответов.',
+                           view=view, status=cache_status)
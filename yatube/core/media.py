@@ -0,0 +1,196 @@
+"""Отдача медиафайлов.
+
+Файл можно передать веб-серверу (MEDIA_ACCEL): nginx по заголовку
+X-Accel-Redirect или Apache с mod_xsendfile по X-Sendfile отдают его
+сами, Django только проверяет путь и условия запроса. Без веб-сервера
+файл уходит через FileResponse: WSGI-сервер с wsgi.file_wrapper
+(например, gunicorn) пересылает его из дескриптора вызовом sendfile
+без копирования в память процесса. Поддерживаются запросы одного
+диапазона байт, ETag и Last-Modified. Файлы с адресацией по содержимому
+(core.storage) не меняются и кэшируются клиентами навсегда.
+"""
+import mimetypes
+import os
+import re
+import stat
+from functools import partial
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class RangeFile:
+    """Часть открытого файла для FileResponse.
+
+    fileno() нужен wsgi.file_wrapper: sendfile начинает с текущей
+    позиции дескриптора и передаёт Content-Length байт.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def is_immutable(name):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return (DIGEST_RE.match(stem) is not None
+            and default_storage.is_hashed(name))
+
+
+def file_etag(stats):
+    return f'"{stats.st_mtime_ns:x}-{stats.st_size:x}"'
+
+
+def make_etag(name, stats):
+    if is_immutable(name):
+        return '"%s"' % os.path.splitext(os.path.basename(name))[0]
+    return file_etag(stats)
+
+
+def byte_range(header, size):
+    """Границы (первый, последний байт) из заголовка Range.
+
+    None — отдавать весь файл: заголовка нет, он не разобран или просит
+    несколько диапазонов. ValueError — диапазон вне файла.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and end < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+
+def if_range_matches(request, etag, last_modified):
+    value = request.META.get('HTTP_IF_RANGE')
+    if not value:
+        return True
+    if value.startswith(('"', 'W/')):
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+def accel_response(name, path, content_type):
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_ACCEL == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = quote(
+            settings.MEDIA_ACCEL_PREFIX + name)
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def file_response(request, path, stats, content_type, etag, last_modified):
+    size = stats.st_size
+    requested = None
+    if if_range_matches(request, etag, last_modified):
+        try:
+            requested = byte_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    start, end = requested or (0, size - 1)
+    length = end - start + 1
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    else:
+        response = FileResponse(RangeFile(open(path, 'rb'), start, length),
+                                content_type=content_type)
+    response['Content-Length'] = length
+    if requested is not None:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def resolve(root, path):
+    """Полный путь и stat файла path внутри root.
+
+    Скрытые файлы и каталоги (например, .incoming хранилища), каталоги
+    и пути за пределами root дают Http404.
+    """
+    if any(part.startswith('.') for part in path.split('/')):
+        raise Http404
+    try:
+        full_path = safe_join(root, path)
+        stats = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not stat.S_ISREG(stats.st_mode):
+        raise Http404
+    return full_path, stats
+
+
+def respond(request, full_path, stats, etag, content_type, max_age,
+            immutable=False, accel=None):
+    """Ответ с файлом, его валидаторами и Cache-Control.
+
+    accel — функция, строящая ответ для веб-сервера вместо файла.
+    """
+    last_modified = int(stats.st_mtime)
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is None:
+        if accel is not None:
+            response = accel()
+        else:
+            response = file_response(request, full_path, stats,
+                                     content_type, etag, last_modified)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if immutable:
+        patch_cache_control(response, public=True,
+                            max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+@require_safe
+def serve(request, path):
+    """Файл MEDIA_ROOT по пути из URL."""
+    full_path, stats = resolve(settings.MEDIA_ROOT, path)
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    accel = None
+    if settings.MEDIA_ACCEL:
+        accel = partial(accel_response, path, full_path, content_type)
+    return respond(request, full_path, stats, make_etag(path, stats),
+                   content_type, settings.MEDIA_MAX_AGE,
+                   immutable=is_immutable(path), accel=accel)
@@ -0,0 +1,107 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import db_router, instrumentation, staticfiles
+
+
+class InstrumentationMiddleware:
+    """Замеряет время представления, SQL, шаблонов и статус кэша ответов.
+
+    Замеры снимаются только с доли запросов INSTRUMENTATION_SAMPLE_RATE;
+    такие ответы получают заголовок Server-Timing, а значения попадают
+    в гистограммы /metrics/.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not instrumentation.sampled():
+            return self.get_response(request)
+        stats = instrumentation.RequestStats()
+        instrumentation.activate(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            instrumentation.deactivate()
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        cache_status = getattr(request, 'cache_status', None)
+        instrumentation.record(view, duration, stats, cache_status)
+        timings = [
+            f'total;dur={duration * 1000:.1f}',
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} SQL"',
+            f'tpl;dur={stats.template_time * 1000:.1f}',
+        ]
+        if cache_status:
+            timings.append(f'cache;desc="{cache_status}"')
+        response['Server-Timing'] = ', '.join(timings)
+        return response
+
+
+class ReplicaMiddleware:
+    """Направляет чтения представлений REPLICA_READ_VIEWS на реплику.
+
+    После запроса, меняющего данные (любым методом, см.
+    db_router.wrote), браузер получает cookie, и до её
+    истечения все его запросы читают из default: пользователь сразу
+    видит свои изменения, даже если реплика отстаёт.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_router.reset()
+        try:
+            response = self.get_response(request)
+            wrote = db_router.wrote()
+        finally:
+            db_router.reset()
+        if wrote or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(settings.REPLICA_STICKY_COOKIE, '1',
+                                max_age=settings.REPLICA_STICKY_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in ('GET', 'HEAD')
+                and request.resolver_match.view_name
+                in settings.REPLICA_READ_VIEWS
+                and settings.REPLICA_STICKY_COOKIE not in request.COOKIES):
+            replica = db_router.choose_replica()
+            if replica:
+                db_router.use_replica(replica)
+                # Реплика может отставать: страница, собранная по её
+                # данным, не должна жить в кэше дольше этого окна.
+                request.cache_timeout = settings.REPLICA_CACHE_TIMEOUT
+
+
+class PreloadMiddleware:
+    """Добавляет HTML-ответам заголовок Link с ресурсами base.html.
+
+    Без DEBUG список ресурсов собирается один раз: шаблоны и манифест
+    статики до перезапуска не меняются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.links = None
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.get('Content-Type', '').startswith('text/html')
+                and 'Link' not in response):
+            if self.links is None or settings.DEBUG:
+                self.links = staticfiles.preload_links()
+            if self.links:
+                response['Link'] = self.links
+        return response
@@ -0,0 +1,152 @@
+"""Статика с хэшами в именах и заранее сжатыми копиями.
+
+collectstatic с CompressedManifestStorage дописывает к именам файлов
+хэш содержимого, складывает соответствие в манифест и кладёт рядом
+с текстовыми файлами копии .gz и, если установлен brotli, .br. Без DEBUG
+статику отдаёт serve: выбирает сжатую копию по Accept-Encoding, а файлы
+из манифеста кэшируются клиентами навсегда. Заголовок Link с ресурсами
+базового шаблона (PreloadMiddleware) позволяет браузеру запросить их
+до разбора HTML.
+"""
+import gzip
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (ManifestStaticFilesStorage,
+                                                staticfiles_storage)
+from django.core.files.base import ContentFile
+from django.templatetags.static import StaticNode
+from django.template.loader import get_template
+from django.template.loader_tags import IncludeNode
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import cached_property
+from django.views.decorators.http import require_safe
+
+from . import media
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.xml',
+                '.html', '.ico', '.ttf', '.eot')
+# Сжатая копия сохраняется, только если она меньше этой доли исходника.
+MIN_RATIO = 0.95
+PRELOAD_TEMPLATE = 'base.html'
+PRELOAD_AS = {
+    '.css': 'style',
+    '.js': 'script',
+    '.woff2': 'font',
+    '.woff': 'font',
+    '.png': 'image',
+    '.jpg': 'image',
+    '.svg': 'image',
+    '.webp': 'image',
+}
+
+
+def encodings():
+    """Кодировки сжатых копий в порядке предпочтения: (имя, суффикс)."""
+    available = [('gzip', '.gz')]
+    if brotli is not None:
+        available.insert(0, ('br', '.br'))
+    return available
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if not dry_run:
+            for name in set(self.hashed_files.values()):
+                if name.endswith(COMPRESSIBLE):
+                    self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as file:
+            data = file.read()
+        for encoding, suffix in encodings():
+            if encoding == 'br':
+                compressed = brotli.compress(data)
+            else:
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            if len(compressed) < len(data) * MIN_RATIO:
+                self._save(name + suffix, ContentFile(compressed))
+
+    @cached_property
+    def immutable_names(self):
+        """Имена с хэшем: их содержимое никогда не меняется."""
+        return frozenset(self.hashed_files.values())
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for item in header.split(','):
+        encoding, _, params = item.partition(';')
+        quality = params.replace(' ', '').lower()
+        # q=0, q=0.0 и т. п.: клиент отказывается от кодировки.
+        if quality.startswith('q=') and quality.strip('q=0.') == '':
+            continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+@require_safe
+def serve(request, path):
+    """Файл STATIC_ROOT, по возможности сжатой копией."""
+    full_path, stats = media.resolve(settings.STATIC_ROOT, path)
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING',
+                                                   ''))
+    chosen = None
+    for encoding, suffix in encodings():
+        if encoding in accepted and os.path.isfile(full_path + suffix):
+            chosen = encoding
+            full_path += suffix
+            stats = os.stat(full_path)
+            break
+    immutable = path in getattr(staticfiles_storage, 'immutable_names', ())
+    response = media.respond(request, full_path, stats,
+                             media.file_etag(stats), content_type,
+                             settings.STATIC_MAX_AGE, immutable=immutable)
+    if chosen is not None:
+        response['Content-Encoding'] = chosen
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def static_paths(template):
+    """Пути {% static %} шаблона и подключённых им через {% include %}
+    шаблонов с постоянным именем."""
+    paths = []
+    for node in template.nodelist.get_nodes_by_type(StaticNode):
+        if isinstance(node.path.var, str):
+            paths.append(node.path.var)
+    for node in template.nodelist.get_nodes_by_type(IncludeNode):
+        if isinstance(node.template.var, str):
+            included = template.engine.get_template(node.template.var)
+            paths.extend(static_paths(included))
+    return paths
+
+
+def preload_links(template_name=PRELOAD_TEMPLATE):
+    """Значение заголовка Link для ресурсов шаблона."""
+    links = []
+    template = get_template(template_name).template
+    for path in dict.fromkeys(static_paths(template)):
+        kind = PRELOAD_AS.get(os.path.splitext(path)[1].lower())
+        if kind is None:
+            continue
+        try:
+            url = staticfiles_storage.url(path)
+        except ValueError:
+            # Файла нет в манифесте: шаблон сам сообщит об ошибке.
+            continue
+        link = f'<{url}>; rel=preload; as={kind}'
+        if kind == 'font':
+            link += '; crossorigin'
+        links.append(link)
+    return ', '.join(links)
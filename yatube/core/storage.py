@@ -0,0 +1,94 @@
+"""Файловое хранилище с адресацией по содержимому.
+
+Файл из каталогов MEDIA_HASHED_DIRS сохраняется под именем из SHA-256
+своего содержимого: posts/ab/cd/abcd….jpg. Одинаковые загрузки ложатся
+в один файл, имя никогда не переиспользуется для другого содержимого,
+поэтому такие файлы можно кэшировать навсегда. Остальные файлы (например,
+миниатюры sorl в cache/) сохраняются как в FileSystemStorage.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.functional import cached_property
+
+TEMP_DIR = '.incoming'
+
+
+def _default_mode():
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# Права, с которыми FileSystemStorage создаёт файлы без
+# FILE_UPLOAD_PERMISSIONS: временные файлы создаются с 0600, а файлы
+# хранилища должен читать и веб-сервер. umask читается при импорте,
+# пока процесс ещё однопоточный.
+DEFAULT_MODE = _default_mode()
+
+
+class HashedFileSystemStorage(FileSystemStorage):
+    @cached_property
+    def hashed_dirs(self):
+        return tuple(directory.strip('/') + '/'
+                     for directory in settings.MEDIA_HASHED_DIRS)
+
+    def is_hashed(self, name):
+        return name.replace('\\', '/').startswith(self.hashed_dirs)
+
+    def hashed_name(self, name, digest):
+        directory = name.replace('\\', '/').split('/', 1)[0]
+        extension = os.path.splitext(name)[1].lower()
+        return (f'{directory}/{digest[:2]}/{digest[2:4]}/'
+                f'{digest}{extension}')
+
+    def get_available_name(self, name, max_length=None):
+        # Имя хэшируемого файла выбирает _save: совпадение имён значит
+        # совпадение содержимого, суффиксы не нужны.
+        if self.is_hashed(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        if not self.is_hashed(name):
+            return super()._save(name, content)
+        digest = getattr(content, 'sha256', None)
+        if digest and hasattr(content, 'temporary_file_path'):
+            # Загрузка уже лежит во временном файле хранилища и посчитана
+            # при приёме (posts/uploads.py): переносится без чтения.
+            name = self._place(self.hashed_name(name, digest),
+                               content.temporary_file_path())
+            # Временный файл перенесён или не нужен (такой уже есть):
+            # закрывается сразу, а не в конце запроса или сборщиком мусора.
+            content.close()
+            return name
+        temp_dir = self.path(TEMP_DIR)
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        sha256 = hashlib.sha256()
+        try:
+            with open(fd, 'wb') as temp:
+                for chunk in content.chunks():
+                    sha256.update(chunk)
+                    temp.write(chunk)
+            return self._place(self.hashed_name(name, sha256.hexdigest()),
+                               temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _place(self, name, temp_path):
+        path = self.path(name)
+        if os.path.exists(path):
+            # Отметка времени защищает файл от collect_media, пока
+            # новая ссылка на него ещё не записана в базу.
+            os.utime(path)
+            return name
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        mode = self.file_permissions_mode
+        os.chmod(temp_path, DEFAULT_MODE if mode is None else mode)
+        os.replace(temp_path, path)
+        return name
@@ -0,0 +1,107 @@
+import os
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template import base
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.loaders import app_directories, cached, filesystem
+from django.template.loaders.base import Loader as BaseLoader
+
+from . import instrumentation
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = instrumentation.current()
+        if stats is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - start
+
+
+class TimedTemplate(base.Template):
+    """Шаблон, учитывающий своё время рендеринга вместе с вложенными
+    {% include %} и родителем {% extends %}."""
+
+    def _render(self, context):
+        stats = instrumentation.current()
+        if stats is None:
+            return super()._render(context)
+        start = time.perf_counter()
+        try:
+            return super()._render(context)
+        finally:
+            stats.add_template(self.name, time.perf_counter() - start)
+
+
+class TimedLoader(BaseLoader):
+    """Загрузчик, создающий TimedTemplate вместо обычного шаблона."""
+
+    def get_template(self, template_name, skip=None):
+        tried = []
+        for origin in self.get_template_sources(template_name):
+            if skip is not None and origin in skip:
+                tried.append((origin, 'Skipped'))
+                continue
+            try:
+                contents = self.get_contents(origin)
+            except TemplateDoesNotExist:
+                tried.append((origin, 'Source does not exist'))
+                continue
+            return TimedTemplate(contents, origin, origin.template_name,
+                                 self.engine)
+        raise TemplateDoesNotExist(template_name, tried=tried)
+
+
+class FilesystemLoader(TimedLoader, filesystem.Loader):
+    pass
+
+
+class AppDirectoriesLoader(TimedLoader, app_directories.Loader):
+    pass
+
+
+class CachedLoader(cached.Loader, TimedLoader):
+    pass
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates, учитывающий время рендеринга в замерах запроса."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(
+            self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return InstrumentedTemplate(
+                self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+    def precompile(self):
+        """Разбирает все шаблоны из DIRS и возвращает их число.
+
+        С кэширующим загрузчиком разобранные шаблоны остаются в памяти,
+        и первый запрос не тратит время на разбор. Синтаксическая ошибка
+        в любом шаблоне останавливает запуск.
+        """
+        count = 0
+        for directory in self.engine.dirs:
+            for root, _, files in os.walk(directory):
+                for filename in sorted(files):
+                    if not filename.endswith('.html'):
+                        continue
+                    name = os.path.relpath(os.path.join(root, filename),
+                                           directory).replace(os.sep, '/')
+                    try:
+                        self.engine.get_template(name)
+                    except TemplateSyntaxError as exc:
+                        raise ImproperlyConfigured(
+                            f'Ошибка в шаблоне {name}: {exc}') from exc
+                    count += 1
+        return count
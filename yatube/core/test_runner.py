@@ -0,0 +1,38 @@
+"""Запуск тестов с файловым кэшем во временном каталоге.
+
+Общий кэш (core.cache) по умолчанию лежит в каталоге проекта и виден
+запущенному из того же клона серверу; тесты не должны ни читать его,
+ни сбрасывать.
+"""
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+@contextmanager
+def temporary_cache():
+    directory = tempfile.mkdtemp(prefix='yatube-cache-')
+    caches = {
+        alias: {**options, 'LOCATION': directory}
+        for alias, options in settings.CACHES.items()
+    }
+    try:
+        with override_settings(CACHES=caches):
+            yield directory
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TemporaryCacheRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache = temporary_cache()
+        self._cache.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,54 @@
+import tempfile
+import threading
+
+from django.test import SimpleTestCase
+
+from ..cache import TieredCache
+
+
+class TieredCacheTests(SimpleTestCase):
+    def make_cache(self, directory=None, **options):
+        if directory is None:
+            temp = tempfile.TemporaryDirectory()
+            self.addCleanup(temp.cleanup)
+            directory = temp.name
+        return TieredCache(directory, {'OPTIONS': {
+            'L1_EXCLUDE_PREFIXES': ['version:'], **options,
+        }})
+
+    def test_shared_between_processes(self):
+        first = self.make_cache()
+        second = self.make_cache(first.shared._dir)
+        first.set('key', {'value': 1})
+        self.assertEqual(second.get('key'), {'value': 1})
+        second.set('version:feed', 'b')
+        first.set('version:feed', 'a')
+        self.assertEqual(second.get('version:feed'), 'a')
+        first.delete('key')
+        # Соседний процесс видит удаление после истечения L1_TIMEOUT.
+        self.assertEqual(second.get('key'), {'value': 1})
+        self.assertIsNone(first.get('key'))
+
+    def test_l1_is_lru_and_returns_copies(self):
+        cache = self.make_cache(L1_MAX_ENTRIES=2)
+        value = {'list': []}
+        cache.set('a', value)
+        cache.get('a')['list'].append(1)
+        self.assertEqual(cache.get('a'), {'list': []})
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(list(cache._local), [cache.make_key('a'),
+                                              cache.make_key('c')])
+
+    def test_add_is_atomic(self):
+        cache = self.make_cache()
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(cache.add('lock', True, 10)))
+            for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 1)
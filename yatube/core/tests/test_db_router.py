@@ -0,0 +1,122 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase)
+from django.test import override_settings
+from django.urls import resolve, reverse
+
+from posts.models import Post
+from .. import db_router
+from ..middleware import ReplicaMiddleware
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTests(SimpleTestCase):
+    router = db_router.ReplicaRouter()
+
+    def route(self, url, method='get', cookies=None, write=False):
+        request = getattr(RequestFactory(), method)(url)
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = resolve(url)
+        seen = {}
+
+        def view(request):
+            seen['read'] = self.router.db_for_read(Post)
+            seen['session'] = self.router.db_for_read(Session)
+            if write:
+                seen['write'] = self.router.db_for_write(Post)
+            return HttpResponse()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaMiddleware(get_response)
+        response = middleware(request)
+        self.assertIsNone(db_router.current_replica())
+        return seen, request, response
+
+    def test_read_views_use_replica(self):
+        seen, request, response = self.route(reverse('posts:index'))
+        self.assertEqual(seen, {'read': 'replica1', 'session': 'default'})
+        self.assertEqual(request.cache_timeout,
+                         settings.REPLICA_CACHE_TIMEOUT)
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_other_views_use_default(self):
+        seen, request, _ = self.route(reverse('posts:search'))
+        self.assertEqual(seen['read'], 'default')
+        self.assertFalse(hasattr(request, 'cache_timeout'))
+
+    def test_write_makes_reads_sticky(self):
+        url = reverse('posts:add_comment', args=[1])
+        seen, _, response = self.route(url, method='post')
+        self.assertEqual(seen['read'], 'default')
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        seen, _, _ = self.route(reverse('posts:index'),
+                                cookies={settings.REPLICA_STICKY_COOKIE: '1'})
+        self.assertEqual(seen['read'], 'default')
+
+    def test_get_write_makes_reads_sticky(self):
+        url = reverse('posts:profile_follow', args=['auth'])
+        seen, _, response = self.route(url, write=True)
+        self.assertEqual(seen['write'], 'default')
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_no_migrations_on_replicas(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+
+
+class StickyAfterWriteTests(TestCase):
+    def test_get_follow_sets_cookie(self):
+        User.objects.create_user(username='auth')
+        self.client.force_login(User.objects.create_user(username='reader'))
+        response = self.client.get(reverse('posts:profile_follow',
+                                           args=['auth']))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        for url in (reverse('posts:index'),
+                    reverse('posts:profile', args=['auth'])):
+            response = self.client.get(url)
+            self.assertNotIn(settings.REPLICA_STICKY_COOKIE,
+                             response.cookies)
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'задайте YATUBE_DB_REPLICAS')
+class ReplicaReadsTests(TransactionTestCase):
+    databases = '__all__'
+
+    def test_index_reads_from_replica(self):
+        cache.clear()
+        Post.objects.create(author=User.objects.create_user(username='auth'),
+                            text='Тестовый пост')
+        queries = []
+
+        def record(alias):
+            def wrapper(execute, sql, params, many, context):
+                queries.append(alias)
+                return execute(sql, params, many, context)
+            return wrapper
+
+        with connections['default'].execute_wrapper(record('default')):
+            replicas = [connections[alias].execute_wrapper(record(alias))
+                        for alias in settings.DATABASE_REPLICAS]
+            for wrapper in replicas:
+                wrapper.__enter__()
+            try:
+                response = self.client.get(reverse('posts:index'))
+            finally:
+                for wrapper in replicas:
+                    wrapper.__exit__(None, None, None)
+        self.assertContains(response, 'Тестовый пост')
+        self.assertTrue(queries)
+        self.assertNotIn('default', queries)
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from .. import instrumentation
+
+User = get_user_model()
+
+
+@override_settings(INSTRUMENTATION_SAMPLE_RATE=1)
+class InstrumentationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        instrumentation.registry.clear()
+
+    def test_server_timing(self):
+        miss = self.client.get(reverse('posts:index'))
+        hit = self.client.get(reverse('posts:index'))
+        self.assertIn('db;dur=', miss['Server-Timing'])
+        self.assertIn('desc="1 SQL"', miss['Server-Timing'])
+        self.assertIn('tpl;dur=', miss['Server-Timing'])
+        self.assertIn('cache;desc="miss"', miss['Server-Timing'])
+        self.assertIn('desc="0 SQL"', hit['Server-Timing'])
+        self.assertIn('cache;desc="hit"', hit['Server-Timing'])
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(instrumentation.registry.render(), '\n')
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_metrics(self):
+        self.client.get(reverse('posts:index'))
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram',
+                      metrics)
+        self.assertIn('yatube_db_queries_bucket{view="posts:index",le="2"} 1',
+                      metrics)
+        self.assertIn('yatube_db_queries_count{view="posts:index"} 1',
+                      metrics)
+        self.assertIn('yatube_response_cache_total'
+                      '{status="miss",view="posts:index"} 1', metrics)
+
+    def test_metrics_hidden_from_public(self):
+        # Через обратный прокси все клиенты приходят с 127.0.0.1.
+        client = Client(REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(client.get(reverse('metrics')).status_code, 404)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        client.force_login(staff)
+        self.assertEqual(client.get(reverse('metrics')).status_code, 200)
@@ -0,0 +1,85 @@
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils.http import http_date
+
+
+class MediaServeTests(TestCase):
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        settings = override_settings(MEDIA_ROOT=temp.name, MEDIA_ACCEL=None)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.hashed = default_storage.save('posts/a.txt',
+                                           ContentFile(b'0123456789'))
+        self.plain = default_storage.save('cache/a.txt',
+                                          ContentFile(b'0123456789'))
+
+    def get(self, name, **headers):
+        return self.client.get('/media/' + name, **headers)
+
+    def test_full_file(self):
+        response = self.get(self.hashed)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        digest = self.hashed.rsplit('/', 1)[1].split('.')[0]
+        self.assertEqual(response['ETag'], f'"{digest}"')
+        plain = self.get(self.plain)
+        self.assertNotIn('immutable', plain['Cache-Control'])
+        self.assertIn('max-age=3600', plain['Cache-Control'])
+
+    def test_ranges(self):
+        cases = {
+            'bytes=2-4': ('2-4/10', b'234'),
+            'bytes=7-': ('7-9/10', b'789'),
+            'bytes=-3': ('7-9/10', b'789'),
+            'bytes=8-100': ('8-9/10', b'89'),
+        }
+        for header, (content_range, body) in cases.items():
+            with self.subTest(header=header):
+                response = self.get(self.hashed, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'],
+                                 f'bytes {content_range}')
+                self.assertEqual(b''.join(response.streaming_content), body)
+        response = self.get(self.hashed, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+        response = self.get(self.hashed, HTTP_RANGE='bytes=0-1,4-5')
+        self.assertEqual(response.status_code, 200)
+        response = self.get(self.hashed, HTTP_RANGE='bytes=2-4',
+                            HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional(self):
+        response = self.get(self.hashed)
+        etag = response['ETag']
+        response = self.get(self.hashed, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.get(self.plain, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 304)
+
+    def test_accel(self):
+        with self.settings(MEDIA_ACCEL='x-accel-redirect'):
+            response = self.get(self.hashed)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/' + self.hashed)
+        with self.settings(MEDIA_ACCEL='x-sendfile'):
+            response = self.get(self.hashed)
+        self.assertEqual(response['X-Sendfile'],
+                         default_storage.path(self.hashed))
+        self.assertEqual(response.content, b'')
+
+    def test_not_found(self):
+        for name in ('missing.txt', '../settings.py', 'posts/',
+                     '.incoming/x'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name).status_code, 404)
+        response = self.client.post('/media/' + self.hashed)
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+from django.db import connections
+from django.test import SimpleTestCase, override_settings
+
+
+class SqlitePragmasTests(SimpleTestCase):
+    def connect(self):
+        """Новое соединение с файлом SQLite: сигнал connection_created
+        срабатывает при открытии."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = {
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(directory.name, 'db.sqlite3'),
+        }
+        wrapper = type(connections['default'])(settings_dict, alias='pragmas')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -64 * 1024)
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234})
+    def test_pragmas_from_settings(self):
+        wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 1234)
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
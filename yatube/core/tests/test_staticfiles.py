@@ -0,0 +1,63 @@
+import gzip
+import os
+import tempfile
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from ..staticfiles import serve
+
+CSS = b'body { color: #000; }\n' * 100
+
+
+class CompressedManifestStorageTests(SimpleTestCase):
+    def setUp(self):
+        source = tempfile.TemporaryDirectory()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(root.cleanup)
+        os.makedirs(os.path.join(source.name, 'css'))
+        with open(os.path.join(source.name, 'css', 'site.css'), 'wb') as f:
+            f.write(CSS)
+        settings = self.settings(
+            STATICFILES_DIRS=[source.name], STATIC_ROOT=root.name,
+            STATICFILES_STORAGE='core.staticfiles.CompressedManifestStorage',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hashed = staticfiles_storage.stored_name('css/site.css')
+
+    def get(self, path, **headers):
+        request = RequestFactory().get('/static/' + path, **headers)
+        return serve(request, path)
+
+    def test_collect_writes_compressed_copies(self):
+        self.assertNotEqual(self.hashed, 'css/site.css')
+        with staticfiles_storage.open(self.hashed + '.gz') as file:
+            self.assertEqual(gzip.decompress(file.read()), CSS)
+        self.assertFalse(staticfiles_storage.exists('css/site.css.gz'))
+
+    def test_serve(self):
+        response = self.get(self.hashed, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)), CSS)
+        response = self.get(self.hashed, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), CSS)
+        response = self.get('css/site.css')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+
+class PreloadTests(TestCase):
+    def test_link_header(self):
+        response = self.client.get('/')
+        self.assertEqual(
+            response['Link'],
+            '</static/css/bootstrap.min.css>; rel=preload; as=style, '
+            '</static/img/logo.png>; rel=preload; as=image',
+        )
@@ -0,0 +1,44 @@
+import hashlib
+import os
+import stat
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, override_settings
+
+from ..storage import DEFAULT_MODE, HashedFileSystemStorage
+
+
+@override_settings(MEDIA_HASHED_DIRS=['posts'])
+class HashedStorageTests(SimpleTestCase):
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.storage = HashedFileSystemStorage(location=temp.name)
+
+    def test_same_content_shares_file(self):
+        digest = hashlib.sha256(b'data').hexdigest()
+        first = self.storage.save('posts/a.JPG', ContentFile(b'data'))
+        second = self.storage.save('posts/b.jpg', ContentFile(b'data'))
+        self.assertEqual(first, f'posts/{digest[:2]}/{digest[2:4]}/'
+                                f'{digest}.jpg')
+        self.assertEqual(second, first)
+        other = self.storage.save('posts/a.jpg', ContentFile(b'other'))
+        self.assertNotEqual(other, first)
+        self.assertEqual(self.storage.listdir('.incoming'), ([], []))
+
+    def test_other_dirs_keep_names(self):
+        first = self.storage.save('cache/a.jpg', ContentFile(b'data'))
+        second = self.storage.save('cache/a.jpg', ContentFile(b'data'))
+        self.assertEqual(first, 'cache/a.jpg')
+        self.assertNotEqual(second, first)
+
+    def test_file_mode(self):
+        name = self.storage.save('posts/a.jpg', ContentFile(b'data'))
+        mode = stat.S_IMODE(os.stat(self.storage.path(name)).st_mode)
+        self.assertEqual(mode, DEFAULT_MODE)
+        with self.settings(FILE_UPLOAD_PERMISSIONS=0o640):
+            storage = HashedFileSystemStorage(location=self.storage.location)
+            name = storage.save('posts/b.jpg', ContentFile(b'other'))
+        mode = stat.S_IMODE(os.stat(storage.path(name)).st_mode)
+        self.assertEqual(mode, 0o640)
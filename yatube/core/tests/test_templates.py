@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .. import instrumentation
+from ..template_backend import InstrumentedDjangoTemplates, TimedTemplate
+
+
+class PrecompileTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        os.makedirs(os.path.join(self.directory, 'includes'))
+        self.write('page.html', '{% include "includes/part.html" %}')
+        self.write('includes/part.html', '{{ value }}')
+
+    def write(self, name, source):
+        with open(os.path.join(self.directory, name), 'w') as f:
+            f.write(source)
+
+    def engine(self):
+        return InstrumentedDjangoTemplates({
+            'NAME': 'precompile',
+            'DIRS': [self.directory],
+            'APP_DIRS': False,
+            'OPTIONS': {'loaders': [
+                ('core.template_backend.CachedLoader',
+                 settings.TEMPLATE_LOADERS),
+            ]},
+        })
+
+    def test_templates_parsed_once(self):
+        engine = self.engine()
+        self.assertEqual(engine.precompile(), 2)
+        os.remove(os.path.join(self.directory, 'page.html'))
+        template = engine.get_template('page.html')
+        self.assertIsInstance(template.template, TimedTemplate)
+        self.assertEqual(template.render({'value': 'ok'}), 'ok')
+
+    def test_syntax_error_stops_startup(self):
+        self.write('includes/broken.html', '{% if %}')
+        with self.assertRaisesMessage(ImproperlyConfigured,
+                                      'includes/broken.html'):
+            self.engine().precompile()
+
+
+@override_settings(INSTRUMENTATION_SAMPLE_RATE=1)
+class TemplateTimingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        instrumentation.registry.clear()
+
+    def test_render_time_per_template(self):
+        self.client.get(reverse('posts:index'))
+        metrics = instrumentation.registry.render()
+        for name in ('posts/index.html', 'base.html',
+                     'includes/header.html', 'includes/paginator.html'):
+            self.assertIn('yatube_template_render_seconds_count'
+                          f'{{template="{name}"}} 1', metrics)
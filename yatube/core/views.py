@@ -1,6 +1,10 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 from http import HTTPStatus
 
+from . import instrumentation
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path},
@@ -20,3 +24,12 @@ def server_error(request):
 def permission_denied(request, exception):
     return render(request, 'core/403.html',
                   status=HTTPStatus.FORBIDDEN)
+
+
+def metrics(request):
+    if not (request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+            or request.user.is_staff):
+        raise Http404
+    return HttpResponse(instrumentation.registry.render(),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
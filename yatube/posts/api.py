@@ -0,0 +1,210 @@
+"""JSON-версии лент и страницы поста с условными GET-запросами.
+
+ETag складывается из версий областей кэша (см. cache.py) и даты самого
+свежего поста, Last-Modified — из этой даты. Если клиент прислал
+совпадающий If-None-Match или If-Modified-Since, ответ 304 отдаётся
+без выборки страницы и без сериализации.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import (condition, require_POST,
+                                          require_safe)
+
+from . import cache, follows
+from .feed import follow_feed
+from .models import Comment, Group, Post, User
+from .utils import CursorPaginator
+from .views import COMMENTS_NUMBER, COMMENTS_ORDERING, POSTS_NUMBER
+
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+FOLLOW_MANY_LIMIT = 1000
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'author': {
+            'username': post.author.username,
+            'name': post.author.get_full_name(),
+        },
+        'group': post.group and {
+            'slug': post.group.slug,
+            'title': post.group.title,
+        },
+        'image': post.image.url if post.image else None,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created,
+    }
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def _etag(request, newest, keys):
+    versions = cache.get_versions(keys + [cache.scope_key(cache.ALL)])
+    raw = '|'.join((
+        request.path,
+        repr(sorted(versions.items())),
+        repr(sorted(request.GET.lists())),
+        str(request.user.pk),
+        newest.isoformat() if newest else '',
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def conditional(source):
+    """Оборачивает source(request, **kwargs) -> (queryset, ключи областей,
+    дата самого свежего изменения или None) в condition().
+
+    source вызывается один раз на запрос: его результат нужен и ETag,
+    и Last-Modified, и самому представлению.
+    """
+    def resolve(request, **kwargs):
+        if not hasattr(request, 'api_source'):
+            request.api_source = source(request, **kwargs)
+        return request.api_source
+
+    def etag(request, **kwargs):
+        _, keys, newest = resolve(request, **kwargs)
+        return _etag(request, newest, keys)
+
+    def last_modified(request, **kwargs):
+        return resolve(request, **kwargs)[2]
+
+    def decorator(view):
+        @require_safe
+        @condition(etag_func=etag, last_modified_func=last_modified)
+        @wraps(view)
+        def wrapper(request, **kwargs):
+            return view(request, resolve(request, **kwargs)[0])
+        return wrapper
+    return decorator
+
+
+def _newest(posts):
+    # Срез, а не values_list: лента подписок может быть не QuerySet
+    # (feed.FollowFeed).
+    newest = posts.order_by('-pub_date', '-pk')[:1]
+    return newest[0].pub_date if newest else None
+
+
+def _feed_source(posts, *keys):
+    return posts, list(keys), _newest(posts)
+
+
+def feed_page(request, posts):
+    page = CursorPaginator(posts, POSTS_NUMBER).get_page(
+        request.GET.get('cursor'))
+    return json_response({
+        'results': [serialize_post(post) for post in page],
+        'next': page.next_cursor(),
+        'previous': page.previous_cursor(),
+    })
+
+
+def login_required_json(view):
+    @wraps(view)
+    def wrapper(request, **kwargs):
+        if not request.user.is_authenticated:
+            return json_response({'detail': 'Требуется вход.'}, status=401)
+        return view(request, **kwargs)
+    return wrapper
+
+
+@conditional(lambda request: _feed_source(
+    Post.objects.feed(), cache.scope_key(cache.FEED)))
+def index(request, posts):
+    return feed_page(request, posts)
+
+
+def _group_source(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return _feed_source(group.posts.feed(),
+                        cache.scope_key(cache.GROUP, group.pk))
+
+
+@conditional(_group_source)
+def group_posts(request, posts):
+    return feed_page(request, posts)
+
+
+def _profile_source(request, username):
+    author = get_object_or_404(User, username=username)
+    return _feed_source(author.posts.feed(),
+                        cache.scope_key(cache.AUTHOR, author.pk))
+
+
+@conditional(_profile_source)
+def profile(request, posts):
+    return feed_page(request, posts)
+
+
+@login_required_json
+@conditional(lambda request: _feed_source(
+    follow_feed(request.user), cache.scope_key(cache.FEED),
+    cache.scope_key(cache.FOLLOW, request.user.pk)))
+def follow_index(request, posts):
+    return feed_page(request, posts)
+
+
+@require_POST
+@login_required_json
+def follow_many(request):
+    """Подписка на список авторов: {"usernames": [...]}."""
+    try:
+        usernames = json.loads(request.body)['usernames']
+        if (not isinstance(usernames, list)
+                or not all(isinstance(name, str) for name in usernames)):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return json_response(
+            {'detail': 'Ожидается объект {"usernames": [...]}.'}, status=400)
+    if len(usernames) > FOLLOW_MANY_LIMIT:
+        return json_response(
+            {'detail': f'Не больше {FOLLOW_MANY_LIMIT} авторов за раз.'},
+            status=400)
+    ids, unknown = follows.resolve(usernames)
+    names = {pk: username for username, pk in ids.items()}
+    new = follows.follow_many(request.user, ids.values())
+    return json_response({
+        'followed': [names[pk] for pk in new],
+        'unknown': unknown,
+    })
+
+
+def _post_source(request, post_id):
+    post = get_object_or_404(Post.objects.feed(), pk=post_id)
+    last_comment = Comment.objects.filter(post_id=post_id).order_by(
+        '-created').values_list('created', flat=True).first()
+    keys = [cache.scope_key(cache.POST, post.pk),
+            cache.scope_key(cache.AUTHOR, post.author_id)]
+    return post, keys, max(filter(None, (post.pub_date, last_comment)))
+
+
+@conditional(_post_source)
+def post_detail(request, post):
+    comments = Comment.objects.filter(post_id=post.pk).select_related(
+        'author').only('text', 'created', 'post_id', 'author__username')
+    page = CursorPaginator(comments, COMMENTS_NUMBER,
+                           ordering=COMMENTS_ORDERING).get_page(
+        request.GET.get('cursor'))
+    return json_response({
+        **serialize_post(post),
+        'comments_count': post.comments_count,
+        'comments': [serialize_comment(comment) for comment in page],
+        'comments_next': page.next_cursor(),
+    })
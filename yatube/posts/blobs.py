@@ -0,0 +1,127 @@
+"""Счётчики ссылок постов на файлы хранилища.
+
+Файл с адресацией по содержимому (core.storage) может принадлежать
+многим постам, поэтому при удалении поста его нельзя просто стереть.
+Посты сдвигают счётчики MediaBlob при сохранении и удалении, а файлы
+без ссылок стирает команда collect_media после выдержки: за это время
+успевает записаться ссылка от поста, загрузившего тот же файл заново.
+"""
+import json
+import os
+import time
+from collections import Counter
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import MediaBlob, Post
+
+
+def names(image, renditions):
+    """Имена файлов поста: изображение и все его версии."""
+    result = set()
+    if image:
+        result.add(str(image))
+    if renditions:
+        for by_format in json.loads(renditions).values():
+            for files in by_format.values():
+                result.update(name for _, name in files)
+    return result
+
+
+def post_names(post):
+    return names(post.image.name, post.image_renditions)
+
+
+def acquire(blob_names):
+    if not blob_names:
+        return
+    MediaBlob.objects.bulk_create(
+        (MediaBlob(name=name) for name in blob_names),
+        ignore_conflicts=True,
+    )
+    MediaBlob.objects.filter(name__in=blob_names).update(
+        references=F('references') + 1)
+
+
+def release(blob_names):
+    if blob_names:
+        MediaBlob.objects.filter(name__in=blob_names).update(
+            references=Greatest(F('references') - 1, 0))
+
+
+@transaction.atomic
+def recount(batch_size=1000):
+    """Пересчитывает ссылки по всем постам.
+
+    Строки без ссылок остаются с нулём, чтобы collect_media стёр их файлы.
+    """
+    references = Counter()
+    posts = Post.objects.exclude(image='').values_list('image',
+                                                       'image_renditions')
+    for image, renditions in posts.iterator(chunk_size=batch_size):
+        references.update(names(image, renditions))
+    MediaBlob.objects.update(references=0)
+    MediaBlob.objects.bulk_create(
+        (MediaBlob(name=name) for name in references),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    by_count = {}
+    for name, count in references.items():
+        by_count.setdefault(count, []).append(name)
+    for count, blob_names in by_count.items():
+        for start in range(0, len(blob_names), batch_size):
+            MediaBlob.objects.filter(
+                name__in=blob_names[start:start + batch_size]
+            ).update(references=count)
+
+
+def _expired(name, deadline):
+    try:
+        return os.path.getmtime(default_storage.path(name)) <= deadline
+    except FileNotFoundError:
+        return True
+
+
+def orphans():
+    """Файлы каталогов MEDIA_HASHED_DIRS, которых нет в MediaBlob."""
+    root = default_storage.path('')
+    for directory in default_storage.hashed_dirs:
+        for path, _, files in os.walk(os.path.join(root, directory)):
+            found = [os.path.relpath(os.path.join(path, filename), root)
+                     .replace(os.sep, '/') for filename in files]
+            known = set(MediaBlob.objects.filter(
+                name__in=found).values_list('name', flat=True))
+            yield from (name for name in found if name not in known)
+
+
+def collect(grace, with_orphans=False):
+    """Стирает файлы без ссылок, не менявшиеся grace секунд.
+
+    Хранилище обновляет время изменения файла при повторной загрузке
+    того же содержимого, поэтому выдержка защищает файл, ссылка на
+    который ещё не записана. Возвращает имена стёртых файлов.
+    """
+    deadline = time.time() - grace
+    removed = []
+    unreferenced = MediaBlob.objects.filter(references=0).values_list(
+        'name', flat=True)
+    for name in list(unreferenced):
+        if not _expired(name, deadline):
+            continue
+        with transaction.atomic():
+            # Ссылка могла появиться после выборки.
+            if not MediaBlob.objects.filter(
+                    name=name, references=0).delete()[0]:
+                continue
+            default_storage.delete(name)
+        removed.append(name)
+    if with_orphans:
+        for name in list(orphans()):
+            if _expired(name, deadline):
+                default_storage.delete(name)
+                removed.append(name)
+    return removed
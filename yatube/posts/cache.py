@@ -0,0 +1,119 @@
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+ALL = 'all'
+FEED = 'feed'
+POST = 'post'
+GROUP = 'group'
+AUTHOR = 'author'
+FOLLOW = 'follow'
+
+VERSION_PREFIX = 'posts:version:'
+RESPONSE_PREFIX = 'posts:response:'
+LOCK_SUFFIX = ':lock'
+LOCK_TIMEOUT = 10
+
+
+def scope_key(scope, pk=None):
+    if pk is None:
+        return f'{VERSION_PREFIX}{scope}'
+    return f'{VERSION_PREFIX}{scope}:{pk}'
+
+
+def get_versions(keys):
+    """Текущие версии областей; отсутствующие создаются заново."""
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return versions
+
+
+def invalidate(*keys):
+    cache.set_many({key: uuid.uuid4().hex for key in keys}, None)
+
+
+def invalidate_all():
+    invalidate(scope_key(ALL))
+
+
+def depend_on(request, *keys):
+    """Привязывает кэшируемый ответ к версиям указанных областей."""
+    dependencies = getattr(request, 'cache_dependencies', None)
+    if dependencies is None:
+        return
+    new = [key for key in keys if key not in dependencies]
+    if new:
+        dependencies.update(get_versions(new))
+
+
+def _response_key(request, name, args, kwargs):
+    if request.user.is_authenticated:
+        csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+        if not csrf_cookie:
+            return None
+        auth = f'user:{request.user.pk}:{csrf_cookie}'
+    else:
+        auth = 'anonymous'
+    raw = '|'.join((
+        name,
+        repr(args),
+        repr(sorted(kwargs.items())),
+        repr(sorted(request.GET.lists())),
+        auth,
+    ))
+    return RESPONSE_PREFIX + hashlib.md5(raw.encode()).hexdigest()
+
+
+def cache_response(view):
+    """Кэширует ответ представления до изменения областей, от которых
+    он зависит (см. depend_on и обработчики сигналов)."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        key = _response_key(request, view.__name__, args, kwargs)
+        if key is None:
+            return view(request, *args, **kwargs)
+        entry = cache.get(key)
+        lock = key + LOCK_SUFFIX
+        locked = False
+        if entry is not None:
+            response, versions = entry
+            if get_versions(list(versions)) == versions:
+                request.cache_status = 'hit'
+                return response
+            # Устаревшую страницу уже пересобирает другой запрос: пока он
+            # не закончил, отдаём прежнюю. Недавно писавшему пользователю
+            # (cookie REPLICA_STICKY_COOKIE) она не показывается.
+            locked = cache.add(lock, True, LOCK_TIMEOUT)
+            if (not locked and settings.REPLICA_STICKY_COOKIE
+                    not in request.COOKIES):
+                request.cache_status = 'stale'
+                return response
+        request.cache_status = 'miss'
+        request.cache_dependencies = get_versions([scope_key(ALL)])
+        try:
+            response = view(request, *args, **kwargs)
+            cacheable = (
+                response.status_code == 200
+                and not response.streaming
+                and not getattr(request, 'cache_incomplete', False)
+                and not (request.META.get('CSRF_COOKIE_USED')
+                         and not request.user.is_authenticated)
+            )
+            if cacheable:
+                timeout = getattr(request, 'cache_timeout',
+                                  settings.POSTS_CACHE_TIMEOUT)
+                cache.set(key, (response, request.cache_dependencies),
+                          timeout)
+        finally:
+            if locked:
+                cache.delete(lock)
+        return response
+    return wrapper
@@ -0,0 +1,77 @@
+"""Кэш отрендеренных карточек постов для лент.
+
+Ключ карточки — id поста и хэш всего, что в неё выводится, включая
+исходник шаблона, поэтому при правке поста, автора или группы ключ
+меняется сам и сбрасывать ничего не нужно. Карточки страницы читаются
+одним get_many, отрисовываются и записываются одним set_many только
+отсутствующие.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from . import thumbnails
+
+CARD_TEMPLATE = 'includes/post_card.html'
+CARD_PREFIX = 'posts:card:'
+CARD_TIMEOUT = 60 * 60 * 24
+
+_template_hash = None
+
+
+def _template():
+    global _template_hash
+    template = get_template(CARD_TEMPLATE)
+    if _template_hash is None:
+        source = template.template.source.encode()
+        _template_hash = hashlib.md5(source).hexdigest()[:8]
+    return template
+
+
+def card_key(post):
+    raw = '|'.join((
+        post.text,
+        post.pub_date.isoformat() if post.pub_date else '',
+        post.author.username,
+        post.author.get_full_name(),
+        post.group.slug if post.group else '',
+        post.image.name or '',
+        post.image_renditions,
+    ))
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'{CARD_PREFIX}{post.pk}:{_template_hash}:{digest}'
+
+
+def render_cards(posts, request=None):
+    """HTML карточек постов в порядке posts.
+
+    Карточка поста без готовых версий изображения (images.py), у которого
+    ещё нет миниатюры, не кэшируется: следующая отрисовка покажет вместо
+    заглушки изображение.
+    """
+    template = _template()
+    keys = [card_key(post) for post in posts]
+    found = cache.get_many(keys)
+    cards, new = [], {}
+    for key, post in zip(keys, posts):
+        html = found.get(key)
+        if html is None:
+            thumbnail = None
+            complete = True
+            if (post.image and not post.image_renditions
+                    and not thumbnails.is_failed(post.image)):
+                thumbnail = thumbnails.get_ready(post.image)
+                if thumbnail is None:
+                    complete = False
+                    thumbnails.schedule(post.image)
+                    if request is not None:
+                        request.cache_incomplete = True
+            html = template.render({'post': post, 'thumbnail': thumbnail})
+            if complete:
+                new[key] = html
+        cards.append(mark_safe(html))
+    if new:
+        cache.set_many(new, CARD_TIMEOUT)
+    return cards
@@ -0,0 +1,55 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from . import blobs
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+def _shift(queryset, field, delta):
+    return queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def shift_author(user_id, field, delta):
+    # Строки без статистики создаются при чтении (AuthorStats.get_for)
+    # уже с актуальными значениями.
+    _shift(AuthorStats.objects.filter(user_id=user_id), field, delta)
+
+
+def shift_authors(user_ids, field, delta):
+    _shift(AuthorStats.objects.filter(user_id__in=user_ids), field, delta)
+
+
+def shift_group(group_id, delta):
+    if group_id is not None:
+        _shift(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def shift_post_comments(post_id, delta):
+    _shift(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by()
+        .values(field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def recount(batch_size=1000):
+    """Пересчитывает все счётчики по фактическим данным."""
+    AuthorStats.objects.bulk_create(
+        (AuthorStats(user_id=user_id) for user_id in User.objects.filter(
+            stats__isnull=True).values_list('pk', flat=True).iterator()),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    AuthorStats.objects.update(
+        posts_count=_count(Post.objects.all(), 'author'),
+        followers_count=_count(Follow.objects.all(), 'author'),
+        following_count=_count(Follow.objects.all(), 'user'),
+    )
+    Group.objects.update(posts_count=_count(Post.objects.all(), 'group'))
+    Post.objects.update(
+        comments_count=_count(Comment.objects.all(), 'post')
+    )
+    blobs.recount(batch_size)
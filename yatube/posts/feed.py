@@ -0,0 +1,200 @@
+import heapq
+import itertools
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import AuthorStats, FeedEntry, Follow, Post
+from .utils import CURSOR_ORDERING
+
+
+def _followers(author_id):
+    limit = settings.FOLLOW_FEED_FANOUT_LIMIT
+    return list(Follow.objects.filter(author_id=author_id)
+                .values_list('user_id', flat=True)[:limit + 1])
+
+
+def is_fanout_author(author_id):
+    return len(_followers(author_id)) <= settings.FOLLOW_FEED_FANOUT_LIMIT
+
+
+def _bulk_insert(entries):
+    FeedEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.FOLLOW_FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    followers = _followers(post.author_id)
+    if len(followers) > settings.FOLLOW_FEED_FANOUT_LIMIT:
+        return
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+        for user_id in followers
+    )
+
+
+def backfill(user_ids, author_id):
+    posts = (Post.objects.filter(author_id=author_id)
+             .values_list('pk', 'pub_date'))
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+        for user_id in user_ids
+    )
+
+
+def follow(user_id, author_id):
+    if is_fanout_author(author_id):
+        backfill([user_id], author_id)
+
+
+def follow_many(user_id, author_ids):
+    """follow() для нескольких авторов двумя запросами.
+
+    Опирается на AuthorStats.followers_count, поэтому вызывается после
+    сдвига счётчиков новых подписок."""
+    fanout = AuthorStats.objects.filter(
+        user_id__in=author_ids,
+        followers_count__lte=settings.FOLLOW_FEED_FANOUT_LIMIT,
+    ).values('user_id')
+    posts = (Post.objects.filter(author_id__in=fanout)
+             .values_list('pk', 'pub_date'))
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def unfollow(user_id, author_id):
+    """Убирает из ленты посты автора.
+
+    Вызывается до сдвига AuthorStats.followers_count на эту подписку.
+    """
+    FeedEntry.objects.filter(user_id=user_id,
+                             post__author_id=author_id).delete()
+    limit = settings.FOLLOW_FEED_FANOUT_LIMIT
+    before = AuthorStats.get_for(author_id).followers_count
+    after = before - 1
+    if before > limit >= after:
+        # Автор снова раскладывается при публикации: ленты его
+        # подписчиков нужно дополнить постами, прочитанными на лету.
+        # Проверяется переход через порог, а не равенство: при удалении
+        # подписок пачкой строк в Follow уже может быть меньше порога.
+        backfill(_followers(author_id), author_id)
+
+
+def rebuild():
+    """Заново раскладывает ленты по всем подпискам.
+
+    Опирается на AuthorStats.followers_count, поэтому вызывается после
+    пересчёта счётчиков (counters.recount)."""
+    FeedEntry.objects.all().delete()
+    authors = AuthorStats.objects.filter(
+        followers_count__gt=0,
+        followers_count__lte=settings.FOLLOW_FEED_FANOUT_LIMIT,
+    ).values_list('user_id', flat=True)
+    for author_id in authors.iterator():
+        backfill(_followers(author_id), author_id)
+
+
+def _read_time_authors(user):
+    return list(Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.FOLLOW_FEED_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True))
+
+
+def _for_entries(condition):
+    """Условие на поля поста для FeedEntry, где pk поста — post_id."""
+    children = [
+        _for_entries(child) if isinstance(child, Q)
+        else (_entry_field(child[0]), child[1])
+        for child in condition.children
+    ]
+    return Q._new_instance(children, condition.connector, condition.negated)
+
+
+def _entry_field(name):
+    if name.lstrip('-').split('__')[0] == 'pk':
+        return name.replace('pk', 'post_id', 1)
+    return name
+
+
+class FollowFeed:
+    """Лента подписок, в которой есть авторы без раскладки.
+
+    Записи FeedEntry и посты каждого такого автора выбираются отдельными
+    запросами по своим индексам, каждый не длиннее запрошенного среза,
+    и сливаются в Python; посты среза подгружаются одним in_bulk.
+    Для пагинаторов (utils) поддерживает filter по pub_date и pk,
+    order_by по ним, срезы и count.
+    """
+
+    model = Post
+
+    def __init__(self, user, authors, condition=None,
+                 ordering=CURSOR_ORDERING):
+        self.user = user
+        self.authors = authors
+        self.condition = condition or Q()
+        self.ordering = tuple(ordering)
+
+    def filter(self, condition):
+        return FollowFeed(self.user, self.authors,
+                          self.condition & condition, self.ordering)
+
+    def order_by(self, *ordering):
+        return FollowFeed(self.user, self.authors, self.condition, ordering)
+
+    def entries(self):
+        # Посты авторов без раскладки, оставшиеся в ленте с тех пор,
+        # как их было меньше порога, придут из запросов по авторам.
+        return FeedEntry.objects.filter(user=self.user).exclude(
+            post__author_id__in=self.authors
+        ).filter(_for_entries(self.condition))
+
+    def author_posts(self, author_id):
+        return Post.objects.filter(author_id=author_id).filter(
+            self.condition)
+
+    def sources(self, stop):
+        """Запросы (pub_date, pk) всех источников, по stop строк."""
+        entries = self.entries().order_by(
+            *map(_entry_field, self.ordering)
+        ).values_list('pub_date', 'post_id')[:stop]
+        return [entries] + [
+            self.author_posts(author_id).order_by(*self.ordering)
+            .values_list('pub_date', 'pk')[:stop]
+            for author_id in self.authors
+        ]
+
+    def count(self):
+        return self.entries().count() + Post.objects.filter(
+            author_id__in=self.authors).filter(self.condition).count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        descending = self.ordering[0].startswith('-')
+        rows = heapq.merge(*self.sources(stop), reverse=descending)
+        ids = [pk for _, pk in itertools.islice(rows, start, stop)]
+        posts = Post.objects.feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def follow_feed(user):
+    """Лента подписок: записи FeedEntry плюс посты популярных авторов."""
+    authors = _read_time_authors(user)
+    if not authors:
+        return Post.objects.feed().filter(
+            feed_entries__user=user
+        ).order_by('-feed_entries__pub_date')
+    return FollowFeed(user, authors)
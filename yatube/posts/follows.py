@@ -0,0 +1,97 @@
+"""Подписки пачками и выборки графа подписок.
+
+bulk_create не посылает сигналов, поэтому follow_many сам делает то,
+что для одной подписки делают обработчики в signals.py: раскладывает
+посты авторов в ленту, сдвигает счётчики и сбрасывает кэш.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from . import cache, counters, feed
+from .models import AuthorStats, Follow, User
+
+PROFILE_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def resolve(usernames):
+    """id пользователей по username и список неизвестных имён."""
+    usernames = list(dict.fromkeys(name for name in usernames if name))
+    ids = dict(User.objects.filter(username__in=usernames)
+               .values_list('username', 'pk'))
+    return ids, [name for name in usernames if name not in ids]
+
+
+def _lock_follower(user_id):
+    """Блокирует строку статистики подписчика до конца транзакции.
+
+    Пустой UPDATE — первая запись транзакции: параллельный follow_many
+    того же пользователя ждёт её фиксации (в SQLite — на блокировке
+    записи всей базы) и потом видит уже вставленные подписки.
+    """
+    def lock():
+        return AuthorStats.objects.filter(user_id=user_id).update(
+            following_count=F('following_count'))
+
+    if not lock():
+        AuthorStats.get_for(user_id)
+        lock()
+
+
+@transaction.atomic
+def follow_many(user, author_ids):
+    """Подписывает user на авторов и возвращает id новых подписок.
+
+    Повторные подписки и подписка на себя пропускаются. Параллельные
+    вызовы для одного user выполняются по очереди (_lock_follower),
+    поэтому счётчики сдвигаются только на действительно вставленные
+    строки.
+    """
+    author_ids = set(author_ids) - {user.pk}
+    if not author_ids:
+        return []
+    _lock_follower(user.pk)
+    existing = set(Follow.objects.filter(
+        user=user, author_id__in=author_ids).values_list('author_id',
+                                                         flat=True))
+    new = sorted(author_ids - existing)
+    if not new:
+        return []
+    Follow.objects.bulk_create(
+        (Follow(user=user, author_id=author_id) for author_id in new),
+        ignore_conflicts=True,
+    )
+    counters.shift_authors(new, 'followers_count', 1)
+    counters.shift_author(user.pk, 'following_count', len(new))
+    feed.follow_many(user.pk, new)
+    cache.invalidate(
+        cache.scope_key(cache.FOLLOW, user.pk),
+        *(cache.scope_key(cache.AUTHOR, author_id) for author_id in new),
+    )
+    return new
+
+
+def unfollow(user, author):
+    """Удаляет подписку одним запросом; ленты, счётчики и кэш
+    поправят обработчики post_delete."""
+    Follow.objects.filter(user=user, author=author).delete()
+
+
+def _users(follows, field):
+    return follows.select_related(field).only(
+        'pk', *(f'{field}__{name}' for name in PROFILE_FIELDS))
+
+
+def followers(author):
+    """Подписки на автора, из них берётся поле user."""
+    return _users(Follow.objects.filter(author=author), 'user')
+
+
+def following(user):
+    """Подписки пользователя, из них берётся поле author."""
+    return _users(Follow.objects.filter(user=user), 'author')
+
+
+def mutual(user):
+    """Подписки пользователя на тех, кто подписан на него в ответ."""
+    return following(user).filter(
+        author__in=Follow.objects.filter(author=user).values('user'))
@@ -1,4 +1,7 @@
+from django.core.exceptions import ValidationError
 from django.forms import ModelForm
+
+from . import images
 from .models import Post, Comment
 
 
@@ -10,6 +13,34 @@ class PostForm(ModelForm):
                       'text': 'Текст нового поста'}
         fields = ['text', 'group', 'image']
 
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Причины, по которым файлы отклонены ещё при приёме (uploads.py).
+        self.upload_errors = upload_errors or {}
+
+    def clean_image(self):
+        if 'image' in self.upload_errors:
+            raise ValidationError(self.upload_errors['image'])
+        image = self.cleaned_data['image']
+        self.processed_image = None
+        if image and 'image' in self.changed_data:
+            try:
+                self.processed_image = images.process(image)
+            except images.ImageError:
+                raise ValidationError('Не удалось обработать изображение.')
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit=False)
+        if self.processed_image is not None:
+            images.attach(post, self.cleaned_data['image'],
+                          self.processed_image)
+        elif 'image' in self.changed_data:
+            images.detach(post)
+        if commit:
+            post.save()
+        return post
+
 
 class CommentForm(ModelForm):
     class Meta:
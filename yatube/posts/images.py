@@ -0,0 +1,215 @@
+"""Обработка изображений постов при загрузке.
+
+Изображение декодируется один раз: поворачивается по EXIF, очищается
+от метаданных и сохраняется заново — сразу во временный файл хранилища
+с подсчётом хэша (posts.uploads), откуда core.storage переносит его без
+копирования. Рядом кладутся готовые версии — обрезка карточки CARD_SIZE
+и копии нескольких ширин в JPEG и, если Pillow собран с поддержкой,
+в WebP. Размеры и имена версий хранятся в посте, поэтому шаблоны
+строят srcset, width и height без обращения к файлам.
+"""
+import io
+import json
+import os
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from .uploads import StreamedUploadedFile
+
+CARD_SIZE = (960, 339)
+CARD_WIDTHS = (480, 960)
+FULL_WIDTHS = (480, 960, 1920)
+RENDITIONS_DIR = 'posts/renditions'
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+# Форматы, которые пересохраняются без метаданных; остальные
+# (например, GIF с анимацией) хранятся как загружены.
+REENCODE = {'JPEG', 'PNG', 'WEBP'}
+# Расширение хранимого файла берётся из определённого формата, а не из
+# имени, присланного клиентом: по нему выбирается Content-Type.
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+
+Processed = namedtuple('Processed', 'name file width height versions')
+
+
+class ImageError(Exception):
+    pass
+
+
+def formats():
+    """Форматы версий: WebP только при поддержке в сборке Pillow."""
+    available = [('jpeg', 'jpg')]
+    if features.check('webp'):
+        available.append(('webp', 'webp'))
+    return available
+
+
+def _write(image, fmt, output):
+    fmt = fmt.lower()
+    if fmt == 'jpeg':
+        image.convert('RGB').save(output, 'JPEG', quality=JPEG_QUALITY,
+                                  optimize=True, progressive=True)
+    elif fmt == 'webp':
+        image.save(output, 'WEBP', quality=WEBP_QUALITY, method=4)
+    else:
+        image.save(output, fmt)
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    _write(image, fmt, buffer)
+    return buffer.getvalue()
+
+
+def _reencode(image, fmt, name):
+    """Пересохраняет исходник во временный файл хранилища с хэшем."""
+    file = StreamedUploadedFile(name, Image.MIME[fmt])
+    try:
+        _write(image, fmt, file.sink())
+    except Exception:
+        file.close()
+        raise
+    file.finish()
+    return file
+
+
+def _flatten(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB')
+
+
+def _widths(limit, widths):
+    """Ширины не больше исходной; сама исходная — если она меньше всех."""
+    return [width for width in widths if width <= limit] or [limit]
+
+
+def _resize(image, width):
+    if width == image.width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def process(file):
+    """Разбирает загруженный файл, не сохраняя ничего в хранилище.
+
+    Возвращает Processed: имя исходника с расширением его формата,
+    очищенный исходник во временном файле (None, если файл хранится как
+    загружен), его ширину и высоту и версии
+    {'card' | 'full': {формат: [[ширина, байты]]}}.
+    """
+    file.seek(0)
+    try:
+        image = Image.open(file)
+        if image.width * image.height > settings.POSTS_IMAGE_MAX_PIXELS:
+            raise ImageError('слишком много пикселей')
+        image.load()
+    except ImageError:
+        raise
+    except Exception as error:
+        raise ImageError(f'не удалось прочитать изображение: {error}')
+    source_format = image.format
+    if source_format not in EXTENSIONS:
+        raise ImageError(f'неподдерживаемый формат {source_format}')
+    animated = getattr(image, 'is_animated', False)
+    image = ImageOps.exif_transpose(image)
+    stem = os.path.splitext(os.path.basename(file.name or ''))[0]
+    name = f'{stem or "image"}.{EXTENSIONS[source_format]}'
+    cleaned = None
+    if source_format in REENCODE and not animated:
+        cleaned = _reencode(image, source_format, name)
+    flat = _flatten(image)
+    card = ImageOps.fit(flat, CARD_SIZE, Image.LANCZOS)
+    versions = {'card': {}, 'full': {}}
+    for fmt, _ in formats():
+        versions['card'][fmt] = [
+            [width, _encode(_resize(card, width), fmt)]
+            for width in CARD_WIDTHS
+        ]
+        versions['full'][fmt] = [
+            [width, _encode(_resize(flat, width), fmt)]
+            for width in _widths(flat.width, FULL_WIDTHS)
+        ]
+    return Processed(name, cleaned, image.width, image.height, versions)
+
+
+def save_renditions(versions):
+    """Сохраняет версии в хранилище; возвращает JSON с их именами.
+
+    Итоговое имя каждой версии выбирает хранилище по её содержимому
+    (core.storage), от заданного здесь остаются каталог и расширение.
+    """
+    extensions = dict(formats())
+    names = {}
+    for kind, by_format in versions.items():
+        for fmt, files in by_format.items():
+            names.setdefault(kind, {})[fmt] = [
+                [width, default_storage.save(
+                    f'{RENDITIONS_DIR}/{kind}-{width}.'
+                    f'{extensions[fmt]}', ContentFile(content))]
+                for width, content in files
+            ]
+    return json.dumps(names, separators=(',', ':'))
+
+
+def attach(post, file, processed):
+    """Записывает версии и ставит посту обработанный файл и размеры;
+    сам пост не сохраняется."""
+    if processed.file is None:
+        file.seek(0)
+        file.name = processed.name
+        post.image = file
+    else:
+        post.image = processed.file
+    post.image_width = processed.width
+    post.image_height = processed.height
+    post.image_renditions = save_renditions(processed.versions)
+
+
+def detach(post):
+    post.image_width = post.image_height = None
+    post.image_renditions = ''
+
+
+class Picture:
+    """Версии изображения для <picture>: srcset по форматам и размеры."""
+
+    def __init__(self, renditions, width, height):
+        self.width = width
+        self.height = height
+        self.sources = {
+            fmt: ', '.join(f'{default_storage.url(name)} {size}w'
+                           for size, name in files)
+            for fmt, files in renditions.items()
+        }
+        largest = renditions['jpeg'][-1][1]
+        self.src = default_storage.url(largest)
+
+    @property
+    def srcset(self):
+        return self.sources['jpeg']
+
+    @property
+    def webp_srcset(self):
+        return self.sources.get('webp')
+
+
+def pictures(post):
+    """{'card': Picture, 'full': Picture} или None у постов без версий."""
+    if not post.image_renditions:
+        return None
+    renditions = json.loads(post.image_renditions)
+    return {
+        'card': Picture(renditions['card'], *CARD_SIZE),
+        'full': Picture(renditions['full'], post.image_width,
+                        post.image_height),
+    }
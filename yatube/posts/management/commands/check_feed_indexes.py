@@ -0,0 +1,94 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts import follows
+from posts.feed import FollowFeed, follow_feed
+from posts.models import Comment, Follow, Post, User
+from posts.utils import CURSOR_ORDERING, CursorPaginator
+from posts.views import (COMMENTS_NUMBER, COMMENTS_ORDERING, FOLLOWS_NUMBER,
+                         FOLLOWS_ORDERING, POSTS_NUMBER)
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\S+$')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE')
+
+
+def feed_queries():
+    now = timezone.now()
+    user = User(pk=0)
+    posts = Post.objects.feed()
+
+    def with_cursor(queryset, per_page=POSTS_NUMBER,
+                    ordering=CURSOR_ORDERING):
+        paginator = CursorPaginator(queryset, per_page, ordering)
+        return queryset.filter(
+            paginator.seek([now, 0], reverse=False)
+        ).order_by(*paginator.ordering)[:per_page + 1]
+
+    # Подписчик автора, у которого больше FOLLOW_FEED_FANOUT_LIMIT
+    # подписчиков: его лента собирается из нескольких запросов.
+    hybrid = FollowFeed(user, [0])
+    hybrid_cursor = hybrid.filter(
+        CursorPaginator(hybrid, POSTS_NUMBER).seek([now, 0], reverse=False))
+    hybrid_queries = {}
+    for suffix, feed in (('', hybrid), (' (cursor)', hybrid_cursor)):
+        entries, author_posts = feed.sources(POSTS_NUMBER + 1)
+        hybrid_queries[f'follow_index (hybrid, entries){suffix}'] = entries
+        hybrid_queries[f'follow_index (hybrid, author){suffix}'] = (
+            author_posts)
+
+    return {
+        'index': posts[:POSTS_NUMBER],
+        'index (cursor)': with_cursor(posts),
+        'group_posts': posts.filter(group_id=0)[:POSTS_NUMBER],
+        'group_posts (cursor)': with_cursor(posts.filter(group_id=0)),
+        'profile': posts.filter(author_id=0)[:POSTS_NUMBER],
+        'profile (cursor)': with_cursor(posts.filter(author_id=0)),
+        'profile (following)': Follow.objects.filter(user_id=0,
+                                                     author_id=0),
+        'post_detail': posts.filter(pk=0),
+        'post_detail (comments)': Comment.objects.filter(
+            post_id=0).order_by(*COMMENTS_ORDERING)[:COMMENTS_NUMBER + 1],
+        'post_comments (cursor)': with_cursor(
+            Comment.objects.filter(post_id=0), COMMENTS_NUMBER,
+            COMMENTS_ORDERING),
+        'follow_index': follow_feed(user)[:POSTS_NUMBER],
+        **hybrid_queries,
+        'post_create (fan-out)': Follow.objects.filter(
+            author_id=0).values_list('user_id', flat=True),
+        'profile_followers': follows.followers(user).order_by(
+            *FOLLOWS_ORDERING)[:FOLLOWS_NUMBER + 1],
+        'profile_following': follows.following(user).order_by(
+            *FOLLOWS_ORDERING)[:FOLLOWS_NUMBER + 1],
+        'profile_mutual': follows.mutual(user).order_by(
+            *FOLLOWS_ORDERING)[:FOLLOWS_NUMBER + 1],
+    }
+
+
+class Command(BaseCommand):
+    help = ('Проверяет через EXPLAIN QUERY PLAN, что запросы лент '
+            'используют индексы, а не полный просмотр таблиц.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка поддерживает только SQLite.')
+        failed = []
+        for label, queryset in feed_queries().items():
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = [row[-1] for row in cursor.fetchall()]
+            problems = [step for step in plan
+                        if FULL_SCAN.match(step) or TEMP_SORT.search(step)]
+            status = 'FAIL' if problems else 'OK'
+            self.stdout.write(f'{status} {label}')
+            for step in plan:
+                self.stdout.write(f'    {step}')
+            if problems:
+                failed.append(label)
+        if failed:
+            raise CommandError(
+                'Запросы без индекса: ' + ', '.join(failed)
+            )
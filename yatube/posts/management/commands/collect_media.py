@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts.blobs import collect
+
+
+class Command(BaseCommand):
+    help = ('Стирает файлы изображений, на которые не ссылается '
+            'ни один пост.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=60 * 60 * 24,
+            help='не трогать файлы, менявшиеся за столько секунд')
+        parser.add_argument(
+            '--orphans', action='store_true',
+            help='стирать и файлы, не учтённые в счётчиках ссылок')
+
+    def handle(self, *args, **options):
+        removed = collect(options['grace'], options['orphans'])
+        for name in removed:
+            self.stdout.write(name)
+        self.stdout.write(f'Удалено файлов: {len(removed)}')
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки '
+            'в JSON Lines или CSV.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            default='jsonl')
+        parser.add_argument('--model', action='append',
+                            choices=list(transfer.FIELDS),
+                            help='по умолчанию все; для CSV — ровно одна')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('-o', '--output', default='-',
+                            help='файл или - для stdout')
+
+    def handle(self, *args, **options):
+        names = [name for name in transfer.FIELDS
+                 if name in (options['model'] or transfer.FIELDS)]
+        if options['format'] == 'csv' and len(names) != 1:
+            raise CommandError('Для CSV укажите одну модель через --model.')
+        if options['output'] == '-':
+            self._export(names, options, self.stdout)
+        else:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as stream:
+                self._export(names, options, stream)
+
+    def _export(self, names, options, stream):
+        rows = (row for name in names
+                for row in transfer.export_rows(name, options['chunk_size']))
+        if options['format'] == 'csv':
+            transfer.write_csv(names[0], rows, stream)
+        else:
+            transfer.write_jsonl(rows, stream)
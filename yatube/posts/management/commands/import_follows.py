@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import follows
+from posts.models import User
+from posts.transfer import batches
+
+
+class Command(BaseCommand):
+    help = ('Подписывает пользователя на авторов из списка: '
+            'по одному username в строке.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='кого подписать')
+        parser.add_argument('input', help='файл или - для stdin')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден.')
+        if options['input'] == '-':
+            followed, unknown = self._import(user, sys.stdin, options)
+        else:
+            with open(options['input'], encoding='utf-8') as stream:
+                followed, unknown = self._import(user, stream, options)
+        self.stdout.write(f'Новых подписок: {followed}')
+        if unknown:
+            self.stdout.write('Не найдены: ' + ', '.join(unknown))
+
+    def _import(self, user, stream, options):
+        usernames = (line.strip() for line in stream)
+        followed, unknown = 0, []
+        for batch in batches(filter(None, usernames), options['batch_size']):
+            ids, missing = follows.resolve(batch)
+            followed += len(follows.follow_many(user, ids.values()))
+            unknown += missing
+        return followed, unknown
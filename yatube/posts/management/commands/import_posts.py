@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты, комментарии и подписки '
+            'из JSON Lines или CSV.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='файл или - для stdin')
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            default='jsonl')
+        parser.add_argument('--model', choices=list(transfer.FIELDS),
+                            help='модель строк CSV-файла')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['format'] == 'csv' and not options['model']:
+            raise CommandError('Для CSV укажите модель через --model.')
+        if options['input'] == '-':
+            stats = self._import(sys.stdin, options)
+        else:
+            with open(options['input'], encoding='utf-8',
+                      newline='') as stream:
+                stats = self._import(stream, options)
+        for name, (total, skipped) in stats.items():
+            self.stdout.write(f'{name}: строк {total}, пропущено {skipped}')
+
+    def _import(self, stream, options):
+        if options['format'] == 'csv':
+            rows = transfer.read_csv(options['model'], stream)
+        else:
+            rows = transfer.read_jsonl(stream)
+        try:
+            return transfer.import_rows(rows, options['batch_size'])
+        except transfer.TransferError as error:
+            raise CommandError(error)
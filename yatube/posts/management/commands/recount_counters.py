@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов, подписчиков, подписок '
+            'и комментариев по фактическим данным.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        recount(batch_size=options['batch_size'])
+        self.stdout.write('Счётчики пересчитаны.')
@@ -0,0 +1,103 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:43
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+from pytils.translit import translify
+
+FTS_TABLE = 'posts_post_fts'
+
+# Копия posts.search.tokenize на момент миграции: индекс, построенный
+# здесь, не должен зависеть от будущих правок приложения.
+WORD = re.compile(r'\w+')
+CYRILLIC = re.compile('[а-я]')
+MIN_STEM = 3
+MAX_TERM = 100
+ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ией', 'иях', 'ого', 'его', 'ому', 'ему', 'ыми',
+    'ими', 'ешь', 'ишь', 'ать', 'ять', 'ить', 'еть', 'ая', 'яя', 'ое', 'ее',
+    'ые', 'ие', 'ый', 'ий', 'ой', 'ей', 'ам', 'ям', 'ах', 'ях', 'ом', 'ем',
+    'им', 'ым', 'ую', 'юю', 'ть', 'ет', 'ют', 'ут', 'ат', 'ят', 'ит', 'ла',
+    'ли', 'ло', 'ов', 'ев', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь',
+), key=len, reverse=True)
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if CYRILLIC.search(word):
+        for ending in ENDINGS:
+            if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+                word = word[:-len(ending)]
+                break
+    try:
+        return translify(word).lower()
+    except ValueError:
+        return word
+
+
+def tokenize(text):
+    return [stem(word)[:MAX_TERM] for word in WORD.findall(text or '')]
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    fts = False
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(terms)'
+                )
+                fts = True
+            except Exception:
+                # SQLite собран без FTS5: остаётся индекс в SearchTerm.
+                pass
+    for post_id, text in Post.objects.values_list('pk', 'text').iterator():
+        terms = tokenize(text)
+        if fts:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE} (rowid, terms) '
+                    'VALUES (%s, %s)',
+                    [post_id, ' '.join(terms)],
+                )
+            continue
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term, post_id=post_id,
+                       frequency=terms.count(term), length=len(terms))
+            for term in set(terms)
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('frequency', models.PositiveIntegerField()),
+                ('length', models.PositiveIntegerField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_search_term'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
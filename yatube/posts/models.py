@@ -2,6 +2,9 @@ from pytils.translit import slugify
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils.functional import cached_property
+
+from . import images
 
 User = get_user_model()
 
@@ -10,6 +13,7 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(null=False, unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self) -> str:
         return self.title
@@ -23,6 +27,17 @@ class Group(models.Model):
         super().save(*args, **kwargs)
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Посты для лент: только отображаемые поля и число комментариев."""
+        return self.select_related('author', 'group').only(
+            'text', 'pub_date', 'image', 'image_width', 'image_height',
+            'image_renditions', 'comments_count',
+            'author__username', 'author__first_name', 'author__last_name',
+            'group__title', 'group__slug',
+        )
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
@@ -42,13 +57,35 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    image_width = models.PositiveIntegerField(null=True, blank=True,
+                                              editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True,
+                                               editable=False)
+    # JSON с именами готовых версий изображения, см. images.py.
+    image_renditions = models.TextField(blank=True, default='',
+                                        editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text
 
+    @cached_property
+    def pictures(self):
+        return images.pictures(self)
+
     def save(self, *args, **kwargs):
         if not self:
             self = slugify(self.text)[:15]
@@ -65,6 +102,12 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return self.text
 
@@ -80,3 +123,67 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_follow'),
         ]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_user_pub_date_post_idx'),
+        ]
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def get_for(cls, user_id):
+        stats = cls.objects.filter(user_id=user_id).first()
+        if stats is None:
+            stats, _ = cls.objects.get_or_create(
+                user_id=user_id,
+                defaults={
+                    'posts_count': Post.objects.filter(
+                        author_id=user_id).count(),
+                    'followers_count': Follow.objects.filter(
+                        author_id=user_id).count(),
+                    'following_count': Follow.objects.filter(
+                        user_id=user_id).count(),
+                }
+            )
+        return stats
+
+
+class SearchTerm(models.Model):
+    term = models.CharField(max_length=100)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='search_terms')
+    frequency = models.PositiveIntegerField()
+    length = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'post'],
+                                    name='unique_search_term'),
+        ]
+
+
+class MediaBlob(models.Model):
+    """Число постов, ссылающихся на файл хранилища (см. blobs.py)."""
+    name = models.CharField(max_length=255, primary_key=True)
+    references = models.PositiveIntegerField(default=0)
@@ -0,0 +1,222 @@
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from pytils.translit import translify
+
+from .models import Post, SearchTerm
+
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+CYRILLIC = re.compile('[а-я]')
+MIN_STEM = 3
+MAX_TERM = 100
+# Окончания русских слов, от длинных к коротким: лёгкая замена стеммера,
+# которого нет среди зависимостей проекта.
+ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ией', 'иях', 'ого', 'его', 'ому', 'ему', 'ыми',
+    'ими', 'ешь', 'ишь', 'ать', 'ять', 'ить', 'еть', 'ая', 'яя', 'ое', 'ее',
+    'ые', 'ие', 'ый', 'ий', 'ой', 'ей', 'ам', 'ям', 'ах', 'ях', 'ом', 'ем',
+    'им', 'ым', 'ую', 'юю', 'ть', 'ет', 'ют', 'ут', 'ат', 'ят', 'ит', 'ла',
+    'ли', 'ло', 'ов', 'ев', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь',
+), key=len, reverse=True)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if CYRILLIC.search(word):
+        for ending in ENDINGS:
+            if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+                word = word[:-len(ending)]
+                break
+    try:
+        return translify(word).lower()
+    except ValueError:
+        return word
+
+
+def tokenize(text):
+    """Нормализованные термы текста: основа слова в транслитерации."""
+    return [stem(word)[:MAX_TERM] for word in WORD.findall(text or '')]
+
+
+# Таблица FTS появляется и исчезает только с миграцией, поэтому её
+# наличие проверяется один раз для каждой базы процесса.
+_fts_tables = {}
+
+
+def fts_available():
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _fts_tables:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master "
+                "WHERE type = 'table' AND name = %s",
+                [FTS_TABLE],
+            )
+            _fts_tables[name] = cursor.fetchone() is not None
+    return _fts_tables[name]
+
+
+def backend():
+    name = settings.POSTS_SEARCH_BACKEND
+    if name == 'auto':
+        return FtsBackend() if fts_available() else PythonBackend()
+    return {'fts5': FtsBackend, 'python': PythonBackend}[name]()
+
+
+class FtsBackend:
+    """Полнотекстовый индекс SQLite FTS5 с ранжированием bm25()."""
+
+    def index(self, post_id, terms):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post_id])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, terms) VALUES (%s, %s)',
+                [post_id, ' '.join(terms)],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    @staticmethod
+    def _match(terms):
+        return ' '.join('"%s"' % term.replace('"', '""') for term in terms)
+
+    def count(self, terms):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                [self._match(terms)],
+            )
+            return cursor.fetchone()[0]
+
+    def ids(self, terms, start, stop):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}) LIMIT %s OFFSET %s',
+                [self._match(terms), stop - start, start],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PythonBackend:
+    """Инвертированный индекс в таблице SearchTerm, BM25 на Python."""
+
+    def __init__(self):
+        self._ranking = {}
+
+    def index(self, post_id, terms):
+        frequencies = Counter(terms)
+        SearchTerm.objects.filter(post_id=post_id).delete()
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term, post_id=post_id, frequency=frequency,
+                       length=len(terms))
+            for term, frequency in frequencies.items()
+        )
+
+    def remove(self, post_id):
+        SearchTerm.objects.filter(post_id=post_id).delete()
+
+    def clear(self):
+        SearchTerm.objects.all().delete()
+
+    def _ranked(self, terms):
+        terms = set(terms)
+        postings = {}
+        for term, post_id, frequency, length in SearchTerm.objects.filter(
+                term__in=terms).values_list('term', 'post_id', 'frequency',
+                                            'length'):
+            postings.setdefault(term, {})[post_id] = (frequency, length)
+        if len(postings) < len(terms):
+            return []
+        documents = set.intersection(*(set(p) for p in postings.values()))
+        if not documents:
+            return []
+        total = SearchTerm.objects.values('post').distinct().count()
+        lengths = {post_id: length
+                   for found in postings.values()
+                   for post_id, (_, length) in found.items()}
+        average = sum(lengths.values()) / len(lengths)
+        scores = Counter()
+        for found in postings.values():
+            idf = math.log(
+                (total - len(found) + 0.5) / (len(found) + 0.5) + 1
+            )
+            for post_id in documents:
+                frequency, length = found[post_id]
+                scores[post_id] += idf * frequency * (BM25_K1 + 1) / (
+                    frequency + BM25_K1 * (
+                        1 - BM25_B + BM25_B * length / average)
+                )
+        return sorted(documents, key=lambda pk: (-scores[pk], -pk))
+
+    def _cached_ranking(self, terms):
+        key = tuple(sorted(set(terms)))
+        if key not in self._ranking:
+            self._ranking[key] = self._ranked(terms)
+        return self._ranking[key]
+
+    def count(self, terms):
+        return len(self._cached_ranking(terms))
+
+    def ids(self, terms, start, stop):
+        return self._cached_ranking(terms)[start:stop]
+
+
+class SearchResults:
+    """Ленивая выборка для Paginator: считает и режет результаты поиска
+    средствами индекса и подгружает только посты текущей страницы."""
+
+    def __init__(self, query):
+        self.terms = tokenize(query)
+        self.backend = backend()
+
+    def count(self):
+        if not self.terms:
+            return 0
+        return self.backend.count(self.terms)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not self.terms:
+            return []
+        ids = self.backend.ids(self.terms, index.start or 0, index.stop)
+        posts = Post.objects.feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def index_post(post):
+    backend().index(post.pk, tokenize(post.text))
+
+
+def remove_post(post_id):
+    backend().remove(post_id)
+
+
+@transaction.atomic
+def rebuild(batch_size=1000):
+    current = backend()
+    current.clear()
+    posts = Post.objects.values_list('pk', 'text')
+    for post_id, text in posts.iterator(chunk_size=batch_size):
+        current.index(post_id, tokenize(text))
@@ -0,0 +1,144 @@
+from django.core.signals import request_finished
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import blobs, cache, counters, feed, search, thumbnails, utils
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+# Поля пользователя, которые выводятся в карточках его постов.
+CARD_USER_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    instance._loaded_image = instance.__dict__.get('image')
+    instance._loaded_text = instance.__dict__.get('text')
+    instance._loaded_renditions = instance.__dict__.get('image_renditions')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.fan_out_post(instance)
+        counters.shift_author(instance.author_id, 'posts_count', 1)
+        counters.shift_group(instance.group_id, 1)
+    elif instance.group_id != instance._loaded_group_id:
+        counters.shift_group(instance._loaded_group_id, -1)
+        counters.shift_group(instance.group_id, 1)
+    # Загруженные через форму изображения приходят с готовыми версиями;
+    # миниатюра sorl нужна только постам без них.
+    if not raw and instance.image and not instance.image_renditions and (
+            created or instance.image != instance._loaded_image):
+        thumbnails.schedule(instance.image)
+    if created or instance.text != instance._loaded_text:
+        search.index_post(instance)
+    if not raw:
+        files = blobs.post_names(instance)
+        loaded = set() if created else blobs.names(
+            instance._loaded_image, instance._loaded_renditions)
+        blobs.acquire(files - loaded)
+        blobs.release(loaded - files)
+    invalidate_post(instance)
+    instance._loaded_group_id = instance.group_id
+    instance._loaded_image = instance.image.name
+    instance._loaded_text = instance.text
+    instance._loaded_renditions = instance.image_renditions
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.shift_author(instance.author_id, 'posts_count', -1)
+    counters.shift_group(instance.group_id, -1)
+    search.remove_post(instance.pk)
+    blobs.release(blobs.names(instance._loaded_image,
+                              instance._loaded_renditions))
+    invalidate_post(instance)
+
+
+def invalidate_post(post):
+    keys = [
+        cache.scope_key(cache.FEED),
+        cache.scope_key(cache.POST, post.pk),
+        cache.scope_key(cache.AUTHOR, post.author_id),
+    ]
+    for group_id in {post.group_id, post._loaded_group_id} - {None}:
+        keys.append(cache.scope_key(cache.GROUP, group_id))
+    cache.invalidate(*keys)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.shift_post_comments(instance.post_id, 1)
+    cache.invalidate(cache.scope_key(cache.POST, instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.shift_post_comments(instance.post_id, -1)
+    cache.invalidate(cache.scope_key(cache.POST, instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.follow(instance.user_id, instance.author_id)
+        counters.shift_author(instance.author_id, 'followers_count', 1)
+        counters.shift_author(instance.user_id, 'following_count', 1)
+    invalidate_follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    feed.unfollow(instance.user_id, instance.author_id)
+    counters.shift_author(instance.author_id, 'followers_count', -1)
+    counters.shift_author(instance.user_id, 'following_count', -1)
+    invalidate_follow(instance)
+
+
+def invalidate_follow(follow):
+    cache.invalidate(
+        cache.scope_key(cache.FOLLOW, follow.user_id),
+        cache.scope_key(cache.AUTHOR, follow.author_id),
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    cache.invalidate(
+        cache.scope_key(cache.FEED),
+        cache.scope_key(cache.GROUP, instance.pk),
+    )
+
+
+def card_fields(user):
+    return tuple(user.__dict__.get(name) for name in CARD_USER_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    instance._loaded_card_fields = card_fields(instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+    keys = [cache.scope_key(cache.AUTHOR, instance.pk)]
+    if not created and card_fields(instance) != instance._loaded_card_fields:
+        # Имя автора выводится в карточках его постов на всех лентах.
+        keys.append(cache.scope_key(cache.FEED))
+        group_ids = Post.objects.filter(author=instance).exclude(
+            group=None).values_list('group_id', flat=True).distinct()
+        keys.extend(cache.scope_key(cache.GROUP, group_id)
+                    for group_id in group_ids)
+    cache.invalidate(*keys)
+    instance._loaded_card_fields = card_fields(instance)
+
+
+@receiver(request_finished)
+def request_done(sender, **kwargs):
+    # Ответ уже отправлен: числа для пагинации считаются вне его времени.
+    utils.run_scheduled_counts()
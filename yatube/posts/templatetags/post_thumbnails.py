@@ -0,0 +1,19 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def ready_thumbnail(context, image):
+    """Готовая миниатюра или None, пока фоновая очередь её не создала."""
+    if not image or thumbnails.is_failed(image):
+        return None
+    thumbnail = thumbnails.get_ready(image)
+    if thumbnail is None:
+        thumbnails.schedule(image)
+        request = context.get('request')
+        if request is not None:
+            request.cache_incomplete = True
+    return thumbnail
@@ -0,0 +1,93 @@
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..models import Comment, FeedEntry, Follow, Group, Post, User
+
+
+class CheckFeedIndexesTest(TestCase):
+    def test_feed_queries_use_indexes(self):
+        out = StringIO()
+        call_command('check_feed_indexes', stdout=out)
+        self.assertNotIn('FAIL', out.getvalue())
+        self.assertIn('OK follow_index (hybrid, author) (cursor)',
+                      out.getvalue())
+
+
+class TransferCommandsTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='auth')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='slug',
+                                          description='Описание')
+        self.post = Post.objects.create(author=self.author, text='Текст',
+                                        group=self.group)
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def export(self, *args):
+        out = StringIO()
+        call_command('export_posts', *args, stdout=out)
+        return out.getvalue()
+
+    def test_jsonl_round_trip(self):
+        archive = self.export()
+        self.assertEqual(len(archive.splitlines()), 4)
+        pub_date = self.post.pub_date
+        for model in (Follow, Comment, Post, Group, User):
+            model.objects.all().delete()
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as file:
+            file.write(archive)
+            file.flush()
+            call_command('import_posts', file.name, stdout=StringIO())
+        post = Post.objects.get()
+        self.assertEqual(post.pub_date, pub_date)
+        self.assertEqual(post.group.slug, 'slug')
+        self.assertEqual(post.author.username, 'auth')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Group.objects.get().posts_count, 1)
+        reader = User.objects.get(username='reader')
+        self.assertTrue(FeedEntry.objects.filter(user=reader,
+                                                 post=post).exists())
+        self.assertEqual(self.export(), archive)
+        self.assertEqual(Post.objects.create(author=reader, text='Новый').pk,
+                         post.pk + 1)
+
+    def test_csv_requires_single_model(self):
+        with self.assertRaises(CommandError):
+            self.export('--format', 'csv')
+
+    def test_csv_import_skips_unknown_posts(self):
+        archive = self.export('--format', 'csv', '--model', 'comment')
+        archive += f'99,{self.post.pk + 100},reader,Мимо,2021-01-01T00:00\n'
+        Comment.objects.all().delete()
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as file:
+            file.write(archive)
+            file.flush()
+            out = StringIO()
+            call_command('import_posts', file.name, '--format', 'csv',
+                         '--model', 'comment', stdout=out)
+        self.assertIn('comment: строк 2, пропущено 1', out.getvalue())
+        self.assertEqual(Comment.objects.get().text, 'Комментарий')
+
+
+class ImportFollowsTest(TestCase):
+    def test_import_follows(self):
+        reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='auth')
+        Post.objects.create(author=author, text='Текст')
+        out = StringIO()
+        with tempfile.NamedTemporaryFile('w') as file:
+            file.write('auth\n\nnobody\nauth\n')
+            file.flush()
+            call_command('import_follows', 'reader', file.name, stdout=out)
+        self.assertIn('Новых подписок: 1', out.getvalue())
+        self.assertIn('Не найдены: nobody', out.getvalue())
+        self.assertTrue(Follow.objects.filter(user=reader,
+                                              author=author).exists())
+        self.assertTrue(FeedEntry.objects.filter(user=reader).exists())
+        with self.assertRaises(CommandError):
+            call_command('import_follows', 'nobody', file.name)
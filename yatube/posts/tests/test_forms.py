@@ -4,14 +4,24 @@ from django.urls import reverse
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
-from ..models import Group, Post, Comment
+from django.core.management import call_command
+from ..models import Group, MediaBlob, Post, Comment
 from ..forms import PostForm
+from core.storage import DEFAULT_MODE
+import hashlib
+import io
+import json
+import os
 import shutil
 import tempfile
+from unittest import mock
+
+from PIL import Image
 
 User = get_user_model()
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+ORIENTATION = 0x0112
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -186,9 +196,126 @@ class PostCreateFormTests(TestCase):
                              kwargs={'username': f'{self.user.username}'}))
         self.assertEqual(Post.objects.count(), posts_count + 1)
 
+        # Файл хранится под хэшем содержимого (core.storage).
+        digest = hashlib.sha256(small_gif).hexdigest()
         self.assertTrue(
             Post.objects.filter(
                 text='Тестовый текст',
-                image='posts/small.gif'
+                image=f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
             ).exists()
         )
+        # Принятый файл перенесён из временного, а не скопирован.
+        self.assertEqual(
+            os.listdir(os.path.join(TEMP_MEDIA_ROOT, '.incoming')), [])
+        post = Post.objects.get(text='Тестовый текст')
+        mode = os.stat(post.image.path).st_mode & 0o777
+        self.assertEqual(mode, DEFAULT_MODE)
+
+    def test_upload_creates_renditions(self):
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        buffer = io.BytesIO()
+        image = Image.new('RGB', (40, 20), 'red')
+        image.save(buffer, 'JPEG', exif=exif.tobytes())
+        uploaded = SimpleUploadedFile('photo.jpg', buffer.getvalue(),
+                                      content_type='image/jpeg')
+        with mock.patch('tempfile.mkstemp', wraps=tempfile.mkstemp) as mkstemp:
+            self.authorized_client.post(reverse('posts:post_create'),
+                                        data={'text': 'Фото',
+                                              'image': uploaded})
+        post = Post.objects.get(text='Фото')
+        self.assertEqual((post.image_width, post.image_height), (20, 40))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (20, 40))
+            self.assertNotIn(ORIENTATION, stored.getexif())
+        with open(post.image.path, 'rb') as stored:
+            digest = hashlib.sha256(stored.read()).hexdigest()
+        self.assertEqual(os.path.basename(post.image.name), f'{digest}.jpg')
+        renditions = json.loads(post.image_renditions)
+        # Пересохранённый исходник записан сразу с хэшем и перенесён:
+        # через отдельный временный файл хранилища идут только версии.
+        rendition_count = sum(len(files) for by_format in renditions.values()
+                              for files in by_format.values())
+        incoming = os.path.join(TEMP_MEDIA_ROOT, '.incoming')
+        stored_via_temp = [call for call in mkstemp.call_args_list
+                           if call.kwargs.get('dir') == incoming]
+        self.assertEqual(len(stored_via_temp), rendition_count)
+        self.assertEqual(os.listdir(incoming), [])
+        self.assertEqual([width for width, _ in renditions['card']['jpeg']],
+                         [480, 960])
+        self.assertEqual([width for width, _ in renditions['full']['jpeg']],
+                         [20])
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, ' 480w, ')
+
+    def test_extension_follows_detected_format(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 20), 'green').save(buffer, 'PNG')
+        gif = io.BytesIO()
+        Image.new('P', (4, 2)).save(gif, 'GIF')
+        for name, content, extension in (('picture.jpg', buffer, '.png'),
+                                         ('animation.png', gif, '.gif')):
+            with self.subTest(name=name):
+                uploaded = SimpleUploadedFile(name, content.getvalue(),
+                                              content_type='image/jpeg')
+                self.authorized_client.post(
+                    reverse('posts:post_create'),
+                    data={'text': name, 'image': uploaded})
+                post = Post.objects.get(text=name)
+                self.assertEqual(os.path.splitext(post.image.name)[1],
+                                 extension)
+
+    def test_same_upload_shares_files(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 20), 'blue').save(buffer, 'PNG')
+        for text in ('Первый', 'Второй'):
+            uploaded = SimpleUploadedFile('same.png', buffer.getvalue(),
+                                          content_type='image/png')
+            self.authorized_client.post(reverse('posts:post_create'),
+                                        data={'text': text,
+                                              'image': uploaded})
+        first = Post.objects.get(text='Первый')
+        second = Post.objects.get(text='Второй')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image_renditions, second.image_renditions)
+        blob = MediaBlob.objects.get(name=first.image.name)
+        self.assertEqual(blob.references, 2)
+
+        first.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.references, 1)
+        call_command('collect_media', grace=0, stdout=io.StringIO())
+        self.assertTrue(second.image.storage.exists(second.image.name))
+
+        second.delete()
+        call_command('collect_media', grace=3600, stdout=io.StringIO())
+        self.assertTrue(second.image.storage.exists(second.image.name))
+        call_command('collect_media', grace=0, stdout=io.StringIO())
+        self.assertFalse(second.image.storage.exists(second.image.name))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def upload(self, name, content):
+        uploaded = SimpleUploadedFile(name, content)
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Отклонённый', 'image': uploaded})
+
+    def assert_rejected(self, response, message):
+        self.assertFormError(response, 'form', 'image', message)
+        self.assertFalse(Post.objects.filter(text='Отклонённый').exists())
+        incoming = os.path.join(TEMP_MEDIA_ROOT, '.incoming')
+        self.assertEqual(os.listdir(incoming), [])
+
+    def test_upload_limits(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 20), 'green').save(buffer, 'PNG')
+        with self.settings(POSTS_IMAGE_MAX_PIXELS=100):
+            self.assert_rejected(self.upload('big.png', buffer.getvalue()),
+                                 'Слишком большое изображение.')
+        with self.settings(POSTS_IMAGE_MAX_SIZE=64):
+            self.assert_rejected(self.upload('big.png', buffer.getvalue()),
+                                 'Файл больше 64\xa0байта.')
+        self.assert_rejected(self.upload('text.png', b'not an image'),
+                             'Файл не является изображением.')
@@ -1,6 +1,9 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
-from ..models import Group, Post, Comment
+from ..models import AuthorStats, Group, Post, Comment, Follow
 
 User = get_user_model()
 
@@ -38,3 +41,55 @@ class PostModelTest(TestCase):
         comment = PostModelTest.comment
         expected_object_name = comment.text
         self.assertEqual(expected_object_name, str(comment))
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        self.other_group = Group.objects.create(title='Другая группа',
+                                                slug='other',
+                                                description='Описание')
+
+    def test_post_counters(self):
+        post = Post.objects.create(author=self.author, text='Пост',
+                                   group=self.group)
+        self.assertEqual(AuthorStats.get_for(self.author.pk).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.other_group.posts_count, 0)
+        self.assertEqual(AuthorStats.get_for(self.author.pk).posts_count, 0)
+
+    def test_follow_counters(self):
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            AuthorStats.get_for(self.author.pk).followers_count, 1)
+        self.assertEqual(
+            AuthorStats.get_for(self.reader.pk).following_count, 1)
+        follow.delete()
+        self.assertEqual(
+            AuthorStats.get_for(self.author.pk).followers_count, 0)
+
+    def test_recount_repairs_drift(self):
+        Post.objects.create(author=self.author, text='Пост',
+                            group=self.group)
+        AuthorStats.objects.update(posts_count=10)
+        Group.objects.update(posts_count=10)
+        AuthorStats.objects.filter(user=self.reader).delete()
+        call_command('recount_counters', stdout=StringIO())
+        self.assertEqual(AuthorStats.get_for(self.author.pk).posts_count, 1)
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 1)
+        self.assertTrue(AuthorStats.objects.filter(user=self.reader).exists())
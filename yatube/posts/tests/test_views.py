@@ -3,14 +3,23 @@ from django.conf import settings
 from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from ..models import Group, Post, Follow
+from ..models import AuthorStats, Comment, FeedEntry, Group, Post, Follow
+from ..feed import follow_feed
+from ..utils import ELLIPSIS, ApproximatePaginator, CursorPaginator
+from .. import (cache as cache_module, cards, feed, follows, search,
+                thumbnails)
 import shutil
+from unittest import mock
 import tempfile
 
 User = get_user_model()
 
+CARDS_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
 
 class PostTests(TestCase):
     @classmethod
@@ -56,24 +65,82 @@ class PostTests(TestCase):
         super().tearDownClass()
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
     def test_cache_index(self):
-        response = self.authorized_client.get(reverse('posts:index'))
-        posts = response.content
+        for post in (self.post, self.postTwo):
+            thumbnails._generate(post.image.name)
+        response = self.guest_client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            response_cached = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response_cached.content, response.content)
         Post.objects.create(
             text='test_new_post',
             author=self.user,
         )
-        response_old = self.authorized_client.get(reverse('posts:index'))
-        old_posts = response_old.content
-        self.assertEqual(old_posts, posts)
+        response_new = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response_new, 'test_new_post')
+
+    def test_stale_page_while_another_request_renders(self):
+        for post in (self.post, self.postTwo):
+            thumbnails._generate(post.image.name)
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(author=self.user, text='Ещё один пост')
+        # Страницу уже пересобирает другой запрос.
+        with mock.patch.object(cache_module.cache, 'add', return_value=False):
+            response = self.client.get(url)
+            self.assertEqual(response.wsgi_request.cache_status, 'stale')
+            self.assertNotContains(response, 'Ещё один пост')
+            self.client.cookies[settings.REPLICA_STICKY_COOKIE] = '1'
+            response = self.client.get(url)
+            self.assertContains(response, 'Ещё один пост')
+
+    def test_cache_invalidated_by_comment(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.guest_client.get(url)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Новый комментарий'},
+        )
+        response = self.guest_client.get(url)
+        self.assertIsNotNone(response.context)
+
+    def test_cache_invalidated_by_author_name(self):
+        for post in (self.post, self.postTwo):
+            thumbnails._generate(post.image.name)
+        urls = [reverse('posts:index'),
+                reverse('posts:group_posts', args=('slug',))]
+        for url in urls:
+            self.guest_client.get(url)
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Переименованный'
+        author.save()
+        for url in urls:
+            self.assertContains(self.guest_client.get(url),
+                                'Переименованный')
+
+    def test_cache_per_page(self):
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.user) for i in range(12)
+        )
         cache.clear()
-        response_new = self.authorized_client.get(reverse('posts:index'))
-        new_posts = response_new.content
-        self.assertNotEqual(old_posts, new_posts)
+        first = self.guest_client.get(reverse('posts:index'))
+        second = self.guest_client.get(reverse('posts:index') + '?page=2')
+        self.assertNotEqual(first.content, second.content)
+
+    def test_thumbnail_placeholder_until_ready(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.guest_client.get(url)
+        self.assertNotContains(response, '<img class="card-img')
+        self.assertContains(response, 'bg-light')
+        thumbnails._generate(self.post.image.name)
+        response = self.guest_client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, '<img class="card-img')
 
     def test_pages_uses_correct_template(self):
         templates_page_names = {
@@ -217,6 +284,147 @@ class PaginatorViewsTest(TestCase):
             response = self.client.get(tested_url)
             self.assertEqual(len(response.context.get('page_obj')), 3)
 
+    def test_pages_without_count_query(self):
+        cache.clear()
+        self.client.get(reverse('posts:index'))
+        Post.objects.bulk_create(
+            Post(text=f'Новый пост {i}', author=self.author)
+            for i in range(30)
+        )
+        cache_module.invalidate_all()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('posts:index') + '?page=4')
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertTrue(response.context['page_obj'].has_next())
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 5)
+
+    def test_cold_count_does_not_block(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        url = reverse('posts:index')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        page_obj = response.context['page_obj']
+        self.assertIsNone(page_obj.paginator.count)
+        self.assertTrue(page_obj.has_next())
+        self.assertNotContains(response, 'Последняя')
+        # Число считается после отправки ответа, последним запросом.
+        self.assertNotIn('COUNT', ''.join(
+            query['sql'] for query in queries.captured_queries[:-1]))
+        self.assertIn('COUNT', queries.captured_queries[-1]['sql'])
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+        self.assertContains(response, 'Последняя')
+
+    def test_elided_page_range(self):
+        paginator = ApproximatePaginator(Post.objects.all(), 1, count=40)
+        paginator.number = 20
+        self.assertEqual(paginator.elided_page_range(), [
+            1, ELLIPSIS, 18, 19, 20, 21, 22, ELLIPSIS, 40,
+        ])
+        paginator.get_page(2)
+        self.assertEqual(paginator.elided_page_range(),
+                         [1, 2, 3, 4, ELLIPSIS, 40])
+        self.assertEqual(paginator.get_page(13).has_next(), False)
+        self.assertEqual(paginator.num_pages, 13)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Заголовок для тестовой группы',
+            slug='slug',
+            description='Тестовое описание')
+        for i in range(15):
+            author = User.objects.create_user(username=f'author{i}',
+                                              first_name='Имя',
+                                              last_name=f'Фамилия {i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            post = Post.objects.create(text=f'Тестовый пост {i}',
+                                       author=author, group=cls.group)
+            Comment.objects.create(post=post, author=cls.reader,
+                                   text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_feed_query_budget(self):
+        author = Post.objects.first().author
+        pages = {
+            reverse('posts:index'): (self.client, 2),
+            reverse('posts:group_posts', kwargs={'slug': 'slug'}):
+                (self.client, 2),
+            reverse('posts:profile', kwargs={'username': author}):
+                (self.client, 3),
+            reverse('posts:follow_index'): (self.authorized_client, 4),
+        }
+        for url, (client, budget) in pages.items():
+            with self.subTest(url=url), self.assertNumQueries(budget):
+                response = client.get(url)
+                self.assertGreater(len(response.context['page_obj']), 0)
+
+    def test_feed_comment_count(self):
+        post = Post.objects.feed().first()
+        self.assertEqual(post.comments_count, 1)
+
+
+@override_settings(POSTS_CURSOR_PAGINATION=True)
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth',)
+        cls.group = Group.objects.create(
+            title=('Заголовок для тестовой группы'),
+            slug='slug',
+            description='Тестовое описание')
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый пост {i}', author=cls.author,
+                 group=cls.group)
+            for i in range(13)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages(self):
+        list_urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': 'slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        ]
+        for url in list_urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).context['page_obj']
+                self.assertEqual(len(first), 10)
+                self.assertFalse(first.has_previous())
+                self.assertTrue(first.has_next())
+                second = self.client.get(
+                    url, {'cursor': first.next_cursor()}
+                ).context['page_obj']
+                self.assertEqual(len(second), 3)
+                self.assertFalse(second.has_next())
+                self.assertEqual(
+                    {post.pk for post in first} & {post.pk for post in second},
+                    set()
+                )
+                back = self.client.get(
+                    url, {'cursor': second.previous_cursor()}
+                ).context['page_obj']
+                self.assertEqual([post.pk for post in back],
+                                 [post.pk for post in first])
+                self.assertFalse(back.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(reverse('posts:index'),
+                                   {'cursor': 'не курсор'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+
 
 class FollowTests(TestCase):
     def setUp(self):
@@ -251,6 +459,15 @@ class FollowTests(TestCase):
             args=(self.user_following.username,)))
         self.assertEqual(Follow.objects.count(), follower_count - 1)
 
+    def test_profile_shows_new_following_count(self):
+        self.addCleanup(cache.clear)
+        url = reverse('posts:profile',
+                      args=(self.user_follower.username,))
+        self.assertContains(self.client.get(url), 'подписок: 0')
+        self.client_auth_follower.get(reverse(
+            'posts:profile_follow', args=(self.user_following.username,)))
+        self.assertContains(self.client.get(url), 'подписок: 1')
+
     def test_subscription(self):
         Follow.objects.create(user=self.user_follower,
                               author=self.user_following)
@@ -261,3 +478,354 @@ class FollowTests(TestCase):
             'posts:follow_index'))
         self.assertNotContains(response,
                                self.post.text)
+
+    def test_feed_entries_follow_posts(self):
+        Follow.objects.create(user=self.user_follower,
+                              author=self.user_following)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user_follower, post=self.post).exists())
+        new_post = Post.objects.create(author=self.user_following,
+                                       text='Новая запись')
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user_follower, post=new_post).exists())
+        self.client_auth_follower.get(reverse(
+            'posts:profile_unfollow',
+            args=(self.user_following.username,)))
+        self.assertFalse(FeedEntry.objects.filter(
+            user=self.user_follower).exists())
+
+    def test_feed_rebuild(self):
+        Follow.objects.create(user=self.user_follower,
+                              author=self.user_following)
+        entries = list(FeedEntry.objects.values_list('user', 'post'))
+        FeedEntry.objects.all().delete()
+        feed.rebuild()
+        self.assertEqual(list(FeedEntry.objects.values_list('user', 'post')),
+                         entries)
+
+    def test_follow_many(self):
+        authors = [User.objects.create_user(username=f'author{i}')
+                   for i in range(3)]
+        for author in authors:
+            Post.objects.create(author=author, text='Пост')
+        Follow.objects.create(user=self.user_follower, author=authors[2])
+        url = reverse('posts:api_follow_many')
+        usernames = ['author0', 'author1', 'author2', 'author0',
+                     'follower', 'nobody']
+        response = self.client_auth_follower.post(
+            url, {'usernames': usernames}, content_type='application/json')
+        self.assertEqual(response.json(), {
+            'followed': ['author0', 'author1'],
+            'unknown': ['nobody'],
+        })
+        self.assertEqual(Follow.objects.filter(
+            user=self.user_follower).count(), 3)
+        self.assertEqual(FeedEntry.objects.filter(
+            user=self.user_follower).count(), 3)
+        stats = AuthorStats.get_for(self.user_follower.pk)
+        self.assertEqual(stats.following_count, 3)
+        self.assertEqual(AuthorStats.get_for(authors[0].pk).followers_count,
+                         1)
+        response = self.client_auth_follower.post(
+            url, {'usernames': usernames}, content_type='application/json')
+        self.assertEqual(response.json()['followed'], [])
+        self.assertEqual(self.client_auth_follower.post(
+            url, {'usernames': 'author0'}, content_type='application/json'
+        ).status_code, 400)
+
+    def test_follow_many_locks_follower_first(self):
+        author = User.objects.create_user(username='author')
+        with CaptureQueriesContext(connection) as queries:
+            follows.follow_many(self.user_follower, [author.pk])
+        statements = [query['sql'] for query in queries.captured_queries
+                      if not query['sql'].startswith(('SAVEPOINT',
+                                                      'RELEASE'))]
+        # Подписки читаются только после блокировки строки подписчика.
+        self.assertTrue(statements[0].startswith('UPDATE'))
+        self.assertIn('posts_authorstats', statements[0])
+        self.assertEqual(
+            AuthorStats.get_for(self.user_follower.pk).following_count, 1)
+
+    def test_follow_lists(self):
+        cache.clear()
+        Follow.objects.create(user=self.user_follower,
+                              author=self.user_following)
+        Follow.objects.create(user=self.user_following,
+                              author=self.user_follower)
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=other, author=self.user_following)
+        pages = {
+            'posts:profile_followers': ['other', 'follower'],
+            'posts:profile_following': ['follower'],
+            'posts:profile_mutual': ['follower'],
+        }
+        for name, expected in pages.items():
+            with self.subTest(name=name):
+                response = self.client.get(
+                    reverse(name, args=[self.user_following.username]))
+                self.assertEqual(
+                    [user.username for user in response.context['users']],
+                    expected)
+        Follow.objects.filter(user=self.user_following).delete()
+        response = self.client.get(reverse(
+            'posts:profile_mutual', args=[self.user_following.username]))
+        self.assertEqual(response.context['users'], [])
+
+    @override_settings(FOLLOW_FEED_FANOUT_LIMIT=0)
+    def test_subscription_without_fan_out(self):
+        Follow.objects.create(user=self.user_follower,
+                              author=self.user_following)
+        Post.objects.create(author=self.user_following, text='Новая запись')
+        self.assertFalse(FeedEntry.objects.exists())
+        response = self.client_auth_follower.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    @override_settings(FOLLOW_FEED_FANOUT_LIMIT=1)
+    def test_follow_feed_merges_read_time_authors(self):
+        popular = User.objects.create_user(username='popular')
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=other, author=popular)
+        Follow.objects.create(user=self.user_follower, author=popular)
+        Follow.objects.create(user=self.user_follower,
+                              author=self.user_following)
+        for i in range(3):
+            Post.objects.create(author=popular, text=f'Популярный {i}')
+            Post.objects.create(author=self.user_following,
+                                text=f'Обычный {i}')
+        expected = list(Post.objects.filter(
+            author__in=[popular, self.user_following]
+        ).order_by('-pub_date', '-pk'))
+        posts = follow_feed(self.user_follower)
+        self.assertEqual(posts.count(), len(expected))
+        self.assertEqual(posts[2:5], expected[2:5])
+        paginator = CursorPaginator(posts, 3)
+        page = paginator.get_page()
+        pages = [list(page)]
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor())
+            pages.append(list(page))
+        self.assertEqual(sum(pages, []), expected)
+        previous = paginator.get_page(page.previous_cursor())
+        self.assertEqual(list(previous), pages[-2])
+
+    @override_settings(FOLLOW_FEED_FANOUT_LIMIT=2)
+    def test_bulk_unfollow_backfills_below_limit(self):
+        popular = User.objects.create_user(username='popular')
+        others = [User.objects.create_user(username=f'other{i}')
+                  for i in range(3)]
+        for user in others + [self.user_follower]:
+            Follow.objects.create(user=user, author=popular)
+        post = Post.objects.create(author=popular, text='Пост')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        Follow.objects.filter(user__in=others).delete()
+        self.assertEqual(
+            list(FeedEntry.objects.filter(post=post).values_list(
+                'user', flat=True)),
+            [self.user_follower.pk])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='auth')
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('posts:search'),
+                                   {'q': query, **params})
+        return [post.text for post in response.context['page_obj']]
+
+    def test_search_backends(self):
+        for name in ('fts5', 'python'):
+            with self.subTest(backend=name), \
+                    override_settings(POSTS_SEARCH_BACKEND=name):
+                cache.clear()
+                Post.objects.all().delete()
+                kitten = Post.objects.create(author=self.author,
+                                             text='Котёнок спал на окне')
+                Post.objects.create(
+                    author=self.author,
+                    text='Окна, окна и ещё раз окна: про окна')
+                Post.objects.create(author=self.author,
+                                    text='Про собаку')
+                self.assertEqual(self.search('окнами'),
+                                 ['Окна, окна и ещё раз окна: про окна',
+                                  'Котёнок спал на окне'])
+                self.assertEqual(self.search('kotenok'),
+                                 ['Котёнок спал на окне'])
+                self.assertEqual(self.search('котенок окно'),
+                                 ['Котёнок спал на окне'])
+                self.assertEqual(self.search('кошка'), [])
+                kitten.delete()
+                self.assertEqual(self.search('котенок'), [])
+
+    def test_fts_check_runs_once(self):
+        search.fts_available()
+        with self.assertNumQueries(0):
+            search.fts_available()
+
+    def test_search_pagination_keeps_query(self):
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый пост {i}', author=self.author)
+            for i in range(13)
+        )
+        search.rebuild()
+        response = self.client.get(reverse('posts:search'), {'q': 'пост'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertContains(response, '?q=%D0%BF%D0%BE%D1%81%D1%82&amp;page=2')
+        self.assertEqual(len(self.search('пост', page=2)), 3)
+        self.assertEqual(self.search(''), [])
+
+
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        for i in range(25):
+            commenter = User.objects.create_user(username=f'reader{i}')
+            Comment.objects.create(post=cls.post, author=commenter,
+                                   text=f'Комментарий {i}')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_first_comments(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        comments = response.context['comments']
+        self.assertEqual([comment.text for comment in comments],
+                         [f'Комментарий {i}' for i in range(20)])
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, comments.next_cursor())
+
+    def test_load_more_comments(self):
+        first = self.client.get(reverse(
+            'posts:post_detail', args=[self.post.pk])).context['comments']
+        data = self.client.get(reverse('posts:comments', args=[self.post.pk]),
+                               {'cursor': first.next_cursor()}).json()
+        self.assertIsNone(data['next'])
+        self.assertIn('Комментарий 24', data['html'])
+        self.assertNotIn('Комментарий 19', data['html'])
+        self.assertIn('reader20', data['html'])
+
+    def test_comments_of_missing_post(self):
+        response = self.client.get(reverse('posts:comments', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth',
+                                              first_name='Имя')
+        cls.group = Group.objects.create(title='Группа', slug='slug',
+                                         description='Описание')
+        for i in range(12):
+            cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                           text=f'Тестовый пост {i}')
+        Comment.objects.create(post=cls.post, author=cls.author,
+                               text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds(self):
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_posts', args=['slug']),
+            reverse('posts:api_profile', args=['auth']),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), 10)
+                self.assertEqual(data['results'][0], {
+                    'id': self.post.pk,
+                    'text': 'Тестовый пост 11',
+                    'pub_date': data['results'][0]['pub_date'],
+                    'author': {'username': 'auth', 'name': 'Имя'},
+                    'group': {'slug': 'slug', 'title': 'Группа'},
+                    'image': None,
+                })
+                rest = self.client.get(url, {'cursor': data['next']}).json()
+                self.assertEqual(len(rest['results']), 2)
+                self.assertIsNone(rest['next'])
+
+    def test_post_detail(self):
+        data = self.client.get(reverse('posts:api_post_detail',
+                                       args=[self.post.pk])).json()
+        self.assertEqual(data['comments_count'], 1)
+        self.assertEqual(data['comments'][0]['text'], 'Комментарий')
+        self.assertEqual(self.client.get(reverse(
+            'posts:api_post_detail', args=[0])).status_code, 404)
+
+    def test_not_modified(self):
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            cached = self.client.get(url,
+                                     HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        ).status_code, 304)
+        self.post.text = 'Изменён'
+        self.post.save()
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_follow_feed_requires_login(self):
+        url = reverse('posts:api_follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        self.client.force_login(reader)
+        data = self.client.get(url).json()
+        self.assertEqual(data['results'][0]['id'], self.post.pk)
+
+
+@override_settings(MEDIA_ROOT=CARDS_MEDIA_ROOT)
+class PostCardsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth',
+                                              first_name='Имя')
+        cls.group = Group.objects.create(title='Группа', slug='slug',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Тестовый пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(CARDS_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cards_cached_until_post_changes(self):
+        url = reverse('posts:group_posts', kwargs={'slug': 'slug'})
+        self.client.get(url)
+        key = cards.card_key(Post.objects.feed().get(pk=self.post.pk))
+        self.assertIn('Тестовый пост', cache.get(key))
+        with mock.patch.object(cards, '_template') as template:
+            cards.render_cards(Post.objects.feed())
+        template.return_value.render.assert_not_called()
+        self.post.text = 'Изменённый пост'
+        self.post.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Изменённый пост')
+        self.assertNotContains(response, 'Тестовый пост')
+
+    def test_card_without_thumbnail_not_cached(self):
+        post = Post(pk=self.post.pk, text='С картинкой', author=self.author,
+                    image='posts/missing.gif')
+        with mock.patch.object(thumbnails, 'schedule'):
+            html, = cards.render_cards([post])
+        self.assertIn('bg-light', html)
+        self.assertIsNone(cache.get(cards.card_key(post)))
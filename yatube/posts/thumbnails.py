@@ -0,0 +1,98 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+logger = logging.getLogger(__name__)
+
+CARD_GEOMETRY = '960x339'
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+
+_lock = threading.Lock()
+_pending = set()
+_failed = set()
+_executor = None
+
+
+class CachedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который умеет только искать готовые миниатюры."""
+
+    def get_ready(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = CachedThumbnailBackend()
+
+
+def get_ready(image):
+    """Готовая миниатюра карточки или None; изображение не открывается."""
+    if not image or image.name in _failed:
+        return None
+    return backend.get_ready(image, CARD_GEOMETRY, **CARD_OPTIONS)
+
+
+def is_failed(image):
+    return image.name in _failed
+
+
+def _generate(name):
+    try:
+        thumbnail = backend.get_thumbnail(name, CARD_GEOMETRY,
+                                          **CARD_OPTIONS)
+        if not default.kvstore.get(thumbnail):
+            _failed.add(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+        _failed.add(name)
+
+
+def _work(name):
+    try:
+        _generate(name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+        connections.close_all()
+
+
+def _submit(name):
+    global _executor
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POSTS_THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    _executor.submit(_work, name)
+
+
+def schedule(image):
+    """Ставит создание миниатюры в очередь после фиксации транзакции."""
+    if not image:
+        return
+    name = image.name
+    _failed.discard(name)
+    if not settings.POSTS_THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: _generate(name))
+        return
+    transaction.on_commit(lambda: _submit(name))
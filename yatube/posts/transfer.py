@@ -0,0 +1,204 @@
+"""Потоковые выгрузка и загрузка групп, постов, комментариев и подписок.
+
+Строки читаются и пишутся генераторами, вставляются пачками через
+bulk_create, поэтому память не растёт с размером архива. Пользователи
+и группы связываются по username и slug, посты — по первичному ключу.
+"""
+import csv
+import json
+from contextlib import contextmanager
+from itertools import groupby, islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import cache, counters, feed, search
+from .models import Comment, Follow, Group, Post, User
+
+FORMATS = ('jsonl', 'csv')
+# Порядок выгрузки: всё, на что ссылается строка, идёт раньше неё.
+FIELDS = {
+    'group': ('id', 'title', 'slug', 'description'),
+    'post': ('id', 'text', 'pub_date', 'author', 'group', 'image'),
+    'comment': ('id', 'post', 'author', 'text', 'created'),
+    'follow': ('user', 'author'),
+}
+LOOKUPS = {
+    'author': 'author__username',
+    'user': 'user__username',
+    'group': 'group__slug',
+    'post': 'post_id',
+}
+MODELS = {
+    'group': Group,
+    'post': Post,
+    'comment': Comment,
+    'follow': Follow,
+}
+
+
+class TransferError(Exception):
+    pass
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now_add, иначе даты из архива затрутся."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def export_rows(name, chunk_size=2000):
+    fields = FIELDS[name]
+    lookups = [LOOKUPS.get(field, field) for field in fields]
+    queryset = MODELS[name].objects.order_by('pk').values_list(*lookups)
+    for values in queryset.iterator(chunk_size=chunk_size):
+        yield name, {
+            field: value.isoformat() if hasattr(value, 'isoformat') else value
+            for field, value in zip(fields, values)
+        }
+
+
+def write_jsonl(rows, stream):
+    for name, row in rows:
+        stream.write(json.dumps({'model': name, **row},
+                                ensure_ascii=False) + '\n')
+
+
+def write_csv(name, rows, stream):
+    writer = csv.DictWriter(stream, FIELDS[name])
+    writer.writeheader()
+    for _, row in rows:
+        writer.writerow(row)
+
+
+def read_jsonl(stream):
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            name = row.pop('model')
+        except (ValueError, KeyError, AttributeError):
+            raise TransferError(f'строка {number}: ожидается JSON-объект '
+                                f'с полем model')
+        if name not in MODELS:
+            raise TransferError(f'строка {number}: неизвестная модель {name}')
+        yield name, row
+
+
+def read_csv(name, stream):
+    for row in csv.DictReader(stream):
+        yield name, row
+
+
+def _ids(model, field, values):
+    values = set(values) - {None, ''}
+    return dict(model.objects.filter(**{f'{field}__in': values})
+                .values_list(field, 'pk'))
+
+
+def _users(usernames):
+    """id пользователей по username; недостающие создаются без пароля."""
+    usernames = set(usernames) - {None, ''}
+    ids = _ids(User, 'username', usernames)
+    missing = usernames - set(ids)
+    if missing:
+        User.objects.bulk_create(
+            (User(username=username, password='!') for username in missing),
+            ignore_conflicts=True,
+        )
+        ids.update(_ids(User, 'username', missing))
+    return ids
+
+
+def _date(value):
+    if not value or not isinstance(value, str):
+        return value
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise TransferError(f'неверная дата: {value}')
+    return parsed
+
+
+def _build(name, rows):
+    """Объекты моделей из строк архива и число пропущенных строк."""
+    if name == 'group':
+        return [Group(**row) for row in rows], 0
+    users = _users(row[key] for row in rows
+                   for key in ('author', 'user') if key in row)
+    if name == 'follow':
+        objects = [Follow(user_id=users[row['user']],
+                          author_id=users[row['author']])
+                   for row in rows if row['user'] != row['author']]
+        return objects, len(rows) - len(objects)
+    if name == 'post':
+        groups = _ids(Group, 'slug', (row['group'] for row in rows))
+        unknown = {row['group'] for row in rows
+                   if row['group'] and row['group'] not in groups}
+        if unknown:
+            raise TransferError(f'неизвестные группы: {sorted(unknown)}')
+        return [Post(id=row['id'], text=row['text'],
+                     pub_date=_date(row['pub_date']),
+                     author_id=users[row['author']],
+                     group_id=groups.get(row['group']),
+                     image=row['image'] or '')
+                for row in rows], 0
+    posts = set(Post.objects.filter(pk__in={row['post'] for row in rows})
+                .values_list('pk', flat=True))
+    objects = [Comment(id=row['id'], post_id=int(row['post']),
+                       author_id=users[row['author']], text=row['text'],
+                       created=_date(row['created']))
+               for row in rows if int(row['post']) in posts]
+    return objects, len(rows) - len(objects)
+
+
+def import_rows(rows, batch_size=1000):
+    """Загружает строки пачками; уже существующие строки пропускаются.
+
+    bulk_create не посылает сигналов, поэтому в конце пересчитываются
+    счётчики, ленты подписок и поисковый индекс, а кэш сбрасывается.
+    Возвращает число обработанных и пропущенных строк по моделям.
+    """
+    stats = {}
+    dates = (Post._meta.get_field('pub_date'),
+             Comment._meta.get_field('created'))
+    with explicit_dates(*dates):
+        for name, group in groupby(rows, key=lambda item: item[0]):
+            for batch in batches((row for _, row in group), batch_size):
+                with transaction.atomic():
+                    objects, skipped = _build(name, batch)
+                    MODELS[name].objects.bulk_create(
+                        objects, ignore_conflicts=True)
+                total, total_skipped = stats.get(name, (0, 0))
+                stats[name] = (total + len(batch), total_skipped + skipped)
+    _reset_sequences()
+    counters.recount(batch_size=batch_size)
+    feed.rebuild()
+    search.rebuild(batch_size=batch_size)
+    cache.invalidate_all()
+    return stats
+
+
+def _reset_sequences():
+    """Строки вставлены с явными id: сдвигаем автоинкремент за них."""
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), list(MODELS.values()))
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
@@ -0,0 +1,176 @@
+"""Потоковый приём изображений постов.
+
+Обработчики Django по умолчанию принимают файл целиком и только потом
+отдают его форме. ImageUploadHandler проверяет загрузку по мере приёма:
+по первым байтам определяет формат и размеры в пикселях, считает объём
+и SHA-256 и пишет данные во временный файл каталога хранилища, откуда
+core.storage переносит его на место без повторного чтения; так же
+posts.images пишет пересохранённые изображения. Отклонённый файл
+не дочитывается в память и на диск, а причина отказа попадает в ошибки
+поля формы.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import warnings
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.template.defaultfilters import filesizeformat
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image
+
+from core.storage import TEMP_DIR
+
+FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+# Сколько байт начала файла можно накопить в поисках заголовка.
+HEADER_LIMIT = 256 * 1024
+
+
+class StreamedUploadedFile(UploadedFile):
+    """Загруженный файл во временном файле хранилища с готовым хэшем.
+
+    SHA-256 считается по мере записи через write; после finish()
+    файл готов к переносу хранилищем.
+    """
+
+    def __init__(self, name, content_type, charset=None,
+                 content_type_extra=None):
+        directory = default_storage.path(TEMP_DIR)
+        os.makedirs(directory, exist_ok=True)
+        file = tempfile.NamedTemporaryFile(suffix='.upload', dir=directory)
+        super().__init__(file, name, content_type, 0, charset,
+                         content_type_extra)
+        self.sha256 = None
+        self._hash = hashlib.sha256()
+
+    def write(self, data):
+        self._hash.update(data)
+        return self.file.write(data)
+
+    def sink(self):
+        """Объект только с write для Image.save.
+
+        У настоящего файла Pillow пишет прямо в дескриптор, мимо write
+        и подсчёта хэша.
+        """
+        return _Sink(self.write)
+
+    def finish(self):
+        self.size = self.file.tell()
+        self.sha256 = self._hash.hexdigest()
+        self.file.seek(0)
+
+    def temporary_file_path(self):
+        return self.file.name
+
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            # Хранилище уже перенесло файл на место.
+            pass
+
+
+class _Sink:
+    def __init__(self, write):
+        self.write = write
+
+
+def sniff(header, complete=False):
+    """Формат и размеры изображения по началу файла.
+
+    Возвращает None, если данных для заголовка пока мало. Вызывает
+    ValueError, если это не изображение допустимого формата или в нём
+    больше POSTS_IMAGE_MAX_PIXELS пикселей; complete — файл уже целиком.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            image = Image.open(io.BytesIO(header))
+    except Image.DecompressionBombError:
+        raise ValueError('Слишком большое изображение.')
+    except (OSError, SyntaxError):
+        if not complete and len(header) < HEADER_LIMIT:
+            return None
+        raise ValueError('Файл не является изображением.')
+    if image.format not in FORMATS:
+        raise ValueError('Допустимы изображения JPEG, PNG, GIF и WebP.')
+    width, height = image.size
+    if width * height > settings.POSTS_IMAGE_MAX_PIXELS:
+        raise ValueError('Слишком большое изображение.')
+    return image.format, width, height
+
+
+class ImageUploadHandler(FileUploadHandler):
+    def __init__(self, request=None):
+        super().__init__(request)
+        if request is not None and not hasattr(request, 'upload_errors'):
+            request.upload_errors = {}
+
+    def new_file(self, field_name, file_name, content_type, content_length,
+                 charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type,
+                         content_length, charset, content_type_extra)
+        self.header = b''
+        self.image = None
+        self.file = StreamedUploadedFile(file_name, content_type, charset,
+                                         content_type_extra)
+        if content_length and content_length > settings.POSTS_IMAGE_MAX_SIZE:
+            self.reject(self.too_large())
+
+    def too_large(self):
+        limit = filesizeformat(settings.POSTS_IMAGE_MAX_SIZE)
+        return f'Файл больше {limit}.'
+
+    def discard(self, message):
+        self.request.upload_errors[self.field_name] = message
+        self.file.close()
+
+    def reject(self, message):
+        """Отклоняет файл: парсер пропустит его остаток, не сохраняя."""
+        self.discard(message)
+        raise SkipFile()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.POSTS_IMAGE_MAX_SIZE:
+            self.reject(self.too_large())
+        if self.image is None:
+            self.header += raw_data
+            try:
+                self.image = sniff(self.header)
+            except ValueError as error:
+                self.reject(str(error))
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        if self.image is None:
+            try:
+                self.image = sniff(self.header, complete=True)
+            except ValueError as error:
+                self.discard(str(error))
+                return None
+        self.header = b''
+        self.file.finish()
+        return self.file
+
+
+def image_uploads(view):
+    """Принимает файлы запроса через ImageUploadHandler.
+
+    Обработчики можно заменить только до чтения request.POST, а его
+    читает CsrfViewMiddleware, поэтому CSRF проверяется уже внутри.
+    Декоратор ставится внешним, чтобы проверка шла до login_required.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+    return wrapper
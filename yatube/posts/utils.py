@@ -1,8 +1,306 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import collections.abc
+import json
+import threading
+import time
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
 
-def get_context_page(request, queryset, pages: int):
-    paginator = Paginator(queryset, pages)
+CURSOR_ORDERING = ('-pub_date', '-pk')
+COUNT_PREFIX = 'posts:total:'
+COUNT_LOCK_SUFFIX = ':lock'
+# Сколько хранится устаревшее число, пока не посчитано новое.
+COUNT_MAX_AGE = 60 * 60 * 24
+ELLIPSIS = '…'
+
+
+class CursorPage(collections.abc.Sequence):
+    """Страница keyset-пагинации с интерфейсом, похожим на Page."""
+
+    cursor_mode = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<CursorPage of %s objects>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], 'next')
+
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], 'prev')
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу сортировки без COUNT(*) и OFFSET.
+
+    Курсор хранит значения полей сортировки крайнего объекта страницы,
+    поэтому любая страница выбирается одним запросом по индексу.
+    """
+
+    def __init__(self, queryset, per_page, ordering=CURSOR_ORDERING):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+
+    def _fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def encode_cursor(self, obj, direction):
+        model = self.queryset.model
+        values = [
+            self._model_field(model, name).value_to_string(obj)
+            if name != 'pk' else obj.pk
+            for name in self._fields()
+        ]
+        raw = json.dumps([direction] + values, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, *values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()).decode()
+            )
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            return None
+        fields = self._fields()
+        if direction not in ('next', 'prev') or len(values) != len(fields):
+            return None
+        model = self.queryset.model
+        try:
+            values = [
+                self._model_field(model, name).to_python(value)
+                for name, value in zip(fields, values)
+            ]
+        except Exception:
+            return None
+        return direction, values
+
+    @staticmethod
+    def _model_field(model, name):
+        if name == 'pk':
+            return model._meta.pk
+        return model._meta.get_field(name)
+
+    def seek(self, values, reverse):
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, values):
+            field = name.lstrip('-')
+            descending = name.startswith('-') != reverse
+            lookup = '%s__%s' % (field, 'lt' if descending else 'gt')
+            condition |= Q(**equal, **{lookup: value})
+            equal[field] = value
+        # Нестрогая граница по первому полю позволяет СУБД искать
+        # по индексу диапазоном, а не просматривать его с начала.
+        first = self.ordering[0]
+        descending = first.startswith('-') != reverse
+        bound = '%s__%s' % (first.lstrip('-'), 'lte' if descending else 'gte')
+        return Q(**{bound: values[0]}) & condition
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else '-' + name
+            for name in self.ordering
+        ]
+
+    def get_page(self, cursor=None):
+        decoded = self.decode_cursor(cursor)
+        queryset = self.queryset
+        if decoded is None:
+            items = list(queryset.order_by(*self.ordering)
+                         [:self.per_page + 1])
+            return CursorPage(items[:self.per_page], self,
+                              has_next=len(items) > self.per_page,
+                              has_previous=False)
+        direction, values = decoded
+        if direction == 'next':
+            items = list(queryset.filter(self.seek(values, reverse=False))
+                         .order_by(*self.ordering)[:self.per_page + 1])
+            return CursorPage(items[:self.per_page], self,
+                              has_next=len(items) > self.per_page,
+                              has_previous=True)
+        items = list(queryset.filter(self.seek(values, reverse=True))
+                     .order_by(*self._reversed_ordering())
+                     [:self.per_page + 1])
+        has_previous = len(items) > self.per_page
+        items = items[:self.per_page]
+        items.reverse()
+        return CursorPage(items, self, has_next=True,
+                          has_previous=has_previous)
+
+
+_local = threading.local()
+
+
+def cached_count(key, queryset):
+    """Число объектов queryset из кэша или None, если его там нет.
+
+    Отсутствующее или устаревшее на POSTS_COUNT_TIMEOUT число
+    пересчитывается после отправки ответа (run_scheduled_counts),
+    поэтому запрос никогда не ждёт COUNT(*).
+    """
+    value = cache.get(COUNT_PREFIX + key)
+    if value is None or value[1] + settings.POSTS_COUNT_TIMEOUT < time.time():
+        pending = getattr(_local, 'counts', None)
+        if pending is None:
+            pending = _local.counts = {}
+        pending[key] = queryset
+    return None if value is None else value[0]
+
+
+def run_scheduled_counts():
+    """Считает числа, запрошенные cached_count за этот запрос.
+
+    Из процессов, одновременно заметивших устаревшее число, считает
+    один: остальные не получают блокировку и ничего не делают.
+    """
+    pending = getattr(_local, 'counts', None)
+    _local.counts = None
+    for key, queryset in (pending or {}).items():
+        lock = COUNT_PREFIX + key + COUNT_LOCK_SUFFIX
+        if not cache.add(lock, True, settings.POSTS_COUNT_TIMEOUT):
+            continue
+        try:
+            cache.set(COUNT_PREFIX + key, (queryset.count(), time.time()),
+                      COUNT_MAX_AGE)
+        finally:
+            cache.delete(lock)
+
+
+class ApproximatePaginator(Paginator):
+    """Paginator без COUNT(*) на каждом запросе.
+
+    Число объектов берётся из готового счётчика (count) или из кэша
+    по ключу count_key (cached_count); пока в кэше его нет, count равен
+    None и ссылки на последнюю страницу не выводятся. Есть ли следующая
+    страница, видно по лишней строке выборки, и по ней же уточняется
+    num_pages, поэтому неточное число не прячет и не теряет посты.
+    Paginator служит одной странице: elided_page_range строится вокруг
+    последней выбранной.
+    """
+
+    ELLIPSIS = ELLIPSIS
+
+    def __init__(self, object_list, per_page, count=None, count_key=None):
+        super().__init__(object_list, per_page)
+        self._count = count
+        self.count_key = count_key
+        self.number = 1
+
+    @cached_property
+    def count(self):
+        if self._count is not None:
+            return self._count
+        if self.count_key is None:
+            return super().count
+        return cached_count(self.count_key, self.object_list)
+
+    @cached_property
+    def num_pages(self):
+        # Без числа объектов страницы известны только по выборке.
+        if self.count is None:
+            return 1
+        return super().num_pages
+
+    def validate_number(self, number):
+        # Верхняя граница неточна: пустую страницу обнаружит page().
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            number = 1
+        return max(number, 1)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        items = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not items and number > 1:
+            raise EmptyPage('That page contains no results')
+        has_next = len(items) > self.per_page
+        self.number = number
+        # Выборка точнее счётчика: уточняем число страниц по ней.
+        if has_next:
+            self.__dict__['num_pages'] = max(self.num_pages, number + 1)
+        else:
+            self.__dict__['num_pages'] = number
+        return self._get_page(items[:self.per_page], number, self)
+
+    def get_page(self, number):
+        number = self.validate_number(number)
+        try:
+            return self.page(number)
+        except EmptyPage:
+            pass
+        if self.num_pages < number:
+            try:
+                return self.page(self.num_pages)
+            except EmptyPage:
+                pass
+        return self.page(1)
+
+    def elided_page_range(self, on_each_side=2, on_ends=1):
+        """Номера страниц вокруг текущей и по краям, пропуски — ELLIPSIS."""
+        number, last = self.number, self.num_pages
+        if last <= (on_each_side + on_ends) * 2:
+            return list(range(1, last + 1))
+        pages = []
+        if number > on_each_side + on_ends + 2:
+            pages += list(range(1, on_ends + 1)) + [ELLIPSIS]
+            pages += range(number - on_each_side, number + 1)
+        else:
+            pages += range(1, number + 1)
+        if number < last - on_each_side - on_ends - 1:
+            pages += range(number + 1, number + on_each_side + 1)
+            pages += [ELLIPSIS] + list(range(last - on_ends + 1, last + 1))
+        else:
+            pages += range(number + 1, last + 1)
+        return pages
+
+
+def get_context_page(request, queryset, pages: int, cursor=None,
+                     count=None, count_key=None):
+    if cursor is None:
+        cursor = settings.POSTS_CURSOR_PAGINATION
+    if cursor:
+        paginator = CursorPaginator(queryset, pages)
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = ApproximatePaginator(queryset, pages, count=count,
+                                     count_key=count_key)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    if page_obj.has_other_pages() and paginator.count is None:
+        # Ссылка на последнюю страницу появится, когда число посчитается.
+        request.cache_incomplete = True
     return page_obj
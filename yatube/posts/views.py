@@ -1,27 +1,44 @@
+from urllib.parse import urlencode
+
 from django.urls import reverse
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.template.loader import render_to_string
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
+from .models import AuthorStats, Comment, Post, Group, User, Follow
 
-from .utils import get_context_page
+from . import cache, follows, search
+from .feed import follow_feed
+from .uploads import image_uploads
+from .utils import CursorPaginator, get_context_page
 
 SHORT_TEXT = 30
 POSTS_NUMBER = 10
+COMMENTS_NUMBER = 20
+COMMENTS_ORDERING = ('created', 'pk')
+FOLLOWS_NUMBER = 50
+FOLLOWS_ORDERING = ('-pk',)
 
 
+@cache.cache_response
 def index(request):
-    posts = Post.objects.all()
-    page_obj = get_context_page(request, posts, POSTS_NUMBER)
+    cache.depend_on(request, cache.scope_key(cache.FEED))
+    posts = Post.objects.feed()
+    page_obj = get_context_page(request, posts, POSTS_NUMBER,
+                                count_key='index')
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache.cache_response
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    page_obj = get_context_page(request, group.posts.all(), POSTS_NUMBER)
+    cache.depend_on(request, cache.scope_key(cache.GROUP, group.pk))
+    page_obj = get_context_page(request, group.posts.feed(), POSTS_NUMBER,
+                                count=group.posts_count)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -29,11 +46,18 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cache.cache_response
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    author_total_posts = author.posts.count()
-    page_obj = get_context_page(request, author.posts.all(), POSTS_NUMBER)
+    # Число подписок автора меняется вместе с его областью FOLLOW.
+    cache.depend_on(request, cache.scope_key(cache.AUTHOR, author.pk),
+                    cache.scope_key(cache.FOLLOW, author.pk))
+    author_stats = AuthorStats.get_for(author.pk)
+    page_obj = get_context_page(request, author.posts.feed(), POSTS_NUMBER,
+                                count=author_stats.posts_count)
     if request.user.is_authenticated:
+        cache.depend_on(request,
+                        cache.scope_key(cache.FOLLOW, request.user.pk))
         following = Follow.objects.filter(
             user=request.user, author=author
         ).exists()
@@ -42,7 +66,8 @@ def profile(request, username):
     profile = author
     context = {
         'author': author,
-        'author_total_posts': author_total_posts,
+        'author_total_posts': author_stats.posts_count,
+        'author_stats': author_stats,
         'page_obj': page_obj,
         'following': following,
         'profile': profile
@@ -50,22 +75,61 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@cache.cache_response
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    author_total_posts = post.author.posts.count()
+    cache.depend_on(request, cache.scope_key(cache.POST, post_id))
+    post = get_object_or_404(Post.objects.feed(), pk=post_id)
+    cache.depend_on(request, cache.scope_key(cache.AUTHOR, post.author_id))
     form = CommentForm()
     context = {
         'post': post,
-        'author_total_posts': author_total_posts,
+        'author_total_posts': AuthorStats.get_for(
+            post.author_id).posts_count,
         'form': form,
+        'comments': get_comments_page(request, post.pk),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def get_comments_page(request, post_id):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author').only('text', 'created', 'post_id', 'author__username')
+    paginator = CursorPaginator(comments, COMMENTS_NUMBER,
+                                ordering=COMMENTS_ORDERING)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+@cache.cache_response
+def post_comments(request, post_id):
+    cache.depend_on(request, cache.scope_key(cache.POST, post_id))
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    page = get_comments_page(request, post_id)
+    html = render_to_string('includes/comment_list.html',
+                            {'comments': page})
+    return JsonResponse({'html': html, 'next': page.next_cursor()})
+
+
+@cache.cache_response
+def post_search(request):
+    cache.depend_on(request, cache.scope_key(cache.FEED))
+    query = request.GET.get('q', '').strip()
+    page_obj = get_context_page(request, search.SearchResults(query),
+                                POSTS_NUMBER, cursor=False)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@image_uploads
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None,
-                    files=request.FILES or None)
+                    files=request.FILES or None,
+                    upload_errors=request.upload_errors)
     if not form.is_valid():
         return render(request, 'posts/create_post.html', {'form': form})
     post = form.save(commit=False)
@@ -75,13 +139,15 @@ def post_create(request):
                             kwargs={'username': request.user}))
 
 
+@image_uploads
 @login_required
 def post_edit(request, post_id):
     is_edit = True
     post = get_object_or_404(Post, id=post_id)
     form = PostForm(request.POST or None,
                     files=request.FILES or None,
-                    instance=post)
+                    instance=post,
+                    upload_errors=request.upload_errors)
     if post.author != request.user:
         return redirect(reverse('posts:profile',
                                 kwargs={'username': request.user}))
@@ -110,10 +176,12 @@ def add_comment(request, post_id):
 
 
 @login_required
+@cache.cache_response
 def follow_index(request):
-    page_obj = get_context_page(request,
-                                Post.objects.filter(
-                                    author__following__user=request.user), 20)
+    cache.depend_on(request, cache.scope_key(cache.FEED),
+                    cache.scope_key(cache.FOLLOW, request.user.pk))
+    page_obj = get_context_page(request, follow_feed(request.user), 20,
+                                count_key=f'follow:{request.user.pk}')
     context = {
         'page_obj': page_obj,
     }
@@ -122,18 +190,51 @@ def follow_index(request):
 
 @login_required
 def profile_follow(request, username):
-    if request.user != get_object_or_404(User, username=username):
-        Follow.objects.get_or_create(
-            user=request.user,
-            author=User.objects.get(username=username)
-        )
+    author = get_object_or_404(User, username=username)
+    follows.follow_many(request.user, [author.pk])
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    is_follower = Follow.objects.filter(user=request.user, author=author)
-    if is_follower.exists():
-        is_follower.delete()
+    follows.unfollow(request.user, author)
     return redirect('posts:profile', username=author)
+
+
+def follow_list(request, author, queryset, field, title):
+    page_obj = CursorPaginator(queryset, FOLLOWS_NUMBER,
+                               ordering=FOLLOWS_ORDERING).get_page(
+        request.GET.get('cursor'))
+    context = {
+        'author': author,
+        'title': title,
+        'page_obj': page_obj,
+        'users': [getattr(follow, field) for follow in page_obj],
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+@cache.cache_response
+def profile_followers(request, username):
+    author = get_object_or_404(User, username=username)
+    cache.depend_on(request, cache.scope_key(cache.AUTHOR, author.pk))
+    return follow_list(request, author, follows.followers(author), 'user',
+                       'Подписчики')
+
+
+@cache.cache_response
+def profile_following(request, username):
+    author = get_object_or_404(User, username=username)
+    cache.depend_on(request, cache.scope_key(cache.FOLLOW, author.pk))
+    return follow_list(request, author, follows.following(author),
+                       'author', 'Подписки')
+
+
+@cache.cache_response
+def profile_mutual(request, username):
+    author = get_object_or_404(User, username=username)
+    cache.depend_on(request, cache.scope_key(cache.AUTHOR, author.pk),
+                    cache.scope_key(cache.FOLLOW, author.pk))
+    return follow_list(request, author, follows.mutual(author), 'author',
+                       'Взаимные подписки')
@@ -23,7 +23,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = '4m&gkrn3hx4jzz6btf#q#simq9@=y=&2zjl!&(s+a+o6m%q0qu'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('YATUBE_DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -49,11 +49,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.PreloadMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -61,12 +64,20 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Без DEBUG шаблоны разбираются один раз при запуске и берутся из памяти.
+TEMPLATE_LOADERS = [
+    'core.template_backend.FilesystemLoader',
+    'core.template_backend.AppDirectoriesLoader',
+]
+TEMPLATES_PRECOMPILE = not DEBUG
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backend.InstrumentedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS if DEBUG else [
+                ('core.template_backend.CachedLoader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -88,9 +99,40 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# Применяются к каждому новому соединению (core/sqlite.py). WAL позволяет
+# читать параллельно с записью; NORMAL в режиме WAL не теряет
+# целостность, а лишь последние транзакции при отключении питания.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # в КиБ
+    'busy_timeout': 5000,  # мс
+}
+
+# Реплики только для чтения: пути к файлам SQLite (или имена баз)
+# через запятую. Реплицирует их внешний механизм; в тестах они
+# зеркалируют default. Проверка маршрутизации на настоящих файлах:
+# YATUBE_DB_REPLICAS=r1.sqlite3,r2.sqlite3 python manage.py test
+#     core.tests.test_db_router
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+        filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')),
+        1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': name.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -129,9 +171,26 @@ USE_TZ = True
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Файлы этих каталогов хранятся под хэшем содержимого (core.storage).
+DEFAULT_FILE_STORAGE = 'core.storage.HashedFileSystemStorage'
+MEDIA_HASHED_DIRS = ['posts']
+# Кто отдаёт медиафайлы (core/media.py): None — Django через
+# wsgi.file_wrapper, 'x-accel-redirect' — nginx из внутреннего location
+# MEDIA_ACCEL_PREFIX, 'x-sendfile' — Apache с mod_xsendfile.
+MEDIA_ACCEL = os.environ.get('YATUBE_MEDIA_ACCEL') or None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Срок кэширования медиафайлов, чьё имя не задаётся содержимым.
+MEDIA_MAX_AGE = 60 * 60
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+# Без DEBUG collectstatic добавляет к именам хэш и сжатые копии .gz/.br,
+# а статику отдаёт core.staticfiles.serve (core/staticfiles.py).
+if not DEBUG:
+    STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStorage'
+# Срок кэширования статики без хэша в имени.
+STATIC_MAX_AGE = 60 * 60
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -141,8 +200,71 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Общий файловый кэш с LRU в памяти каждого процесса (core/cache.py).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 5,
+            # Версии областей кэша ответов должны сразу быть видны
+            # всем процессам.
+            'L1_EXCLUDE_PREFIXES': ['posts:version:'],
+        },
     }
 }
+
+# Тесты работают с кэшем во временном каталоге (core/test_runner.py).
+TEST_RUNNER = 'core.test_runner.TemporaryCacheRunner'
+
+POSTS_CURSOR_PAGINATION = False
+# Как часто пересчитывается число постов в лентах без готового счётчика.
+POSTS_COUNT_TIMEOUT = 60
+
+# Авторы, у которых подписчиков больше этого числа, не раскладываются
+# по лентам подписчиков при публикации: их посты читаются при запросе.
+FOLLOW_FEED_FANOUT_LIMIT = 1000
+FOLLOW_FEED_BATCH_SIZE = 500
+
+# Ответы лент хранятся долго: сигналы сбрасывают версии зависимых областей
+# при любом изменении постов, комментариев, подписок и групп.
+POSTS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Размер пула потоков, создающих миниатюры; 0 — создавать синхронно
+# после фиксации транзакции.
+POSTS_THUMBNAIL_WORKERS = 2
+
+# Ограничения изображения поста: размер файла в байтах и число пикселей.
+# Загрузка проверяется по мере приёма (posts/uploads.py).
+POSTS_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+POSTS_IMAGE_MAX_PIXELS = 40_000_000
+
+# 'auto' выбирает FTS5, если SQLite собран с ним, иначе индекс SearchTerm.
+POSTS_SEARCH_BACKEND = 'auto'
+
+# Доля запросов, с которых снимаются замеры для Server-Timing и /metrics/.
+INSTRUMENTATION_SAMPLE_RATE = 0.1
+
+# /metrics/ доступен сотрудникам, а без входа — только с этих адресов.
+# За обратным прокси все запросы приходят с его адреса, поэтому
+# по умолчанию список пуст.
+METRICS_ALLOWED_IPS = []
+
+# Представления, которые читают из реплик.
+REPLICA_READ_VIEWS = {
+    'posts:index',
+    'posts:group_posts',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+    'posts:profile_followers',
+    'posts:profile_following',
+    'posts:profile_mutual',
+}
+# Сколько секунд после своей записи пользователь читает из default.
+REPLICA_STICKY_COOKIE = 'db_sticky'
+REPLICA_STICKY_SECONDS = 10
+# Срок жизни в кэше страниц, собранных по данным реплики.
+REPLICA_CACHE_TIMEOUT = 60